@@ -254,7 +254,7 @@ class AbstractProvider(object):
             if not query:
                 return False
 
-            data_cache.set_item('search_query', query)
+            data_cache.set_item('search_query', query, data_cache.ONE_DAY)
 
             if not params.get('incognito') and not params.get('channel_id'):
                 search_history.update(query)
@@ -289,7 +289,7 @@ class AbstractProvider(object):
         return True
 
     def tear_down(self, context):
-        pass
+        context.tear_down()
 
 
 class RegisterProviderPath(object):
@@ -9,6 +9,7 @@
 
 __all__ = (
     'BaseHTTPServer',
+    'ThreadingMixIn',
     'byte_string_type',
     'datetime_infolabel',
     'parse_qs',
@@ -31,6 +32,7 @@ __all__ = (
 try:
     from html import unescape
     from http import server as BaseHTTPServer
+    from socketserver import ThreadingMixIn
     from urllib.parse import (
         parse_qs,
         parse_qsl,
@@ -55,6 +57,7 @@ try:
 # Compatibility shims for Kodi v18 and Python v2.7
 except ImportError:
     import BaseHTTPServer
+    from SocketServer import ThreadingMixIn
     from contextlib import contextmanager as _contextmanager
     from urllib import (
         quote as _quote,
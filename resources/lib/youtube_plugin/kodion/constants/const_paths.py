@@ -26,6 +26,7 @@ SUBSCRIPTIONS = '/subscriptions/list'
 API = '/youtube/api'
 API_SUBMIT = '/youtube/api/submit'
 DRM = '/youtube/widevine'
+GATEWAY = '/youtube/gateway'
 IP = '/youtube/client_ip'
 MPD = '/youtube/manifest/dash/'
 PING = '/youtube/ping'
@@ -27,6 +27,7 @@ SUBTITLE_DOWNLOAD = 'kodion.subtitle.download'  # (bool)
 
 ITEMS_PER_PAGE = 'kodion.content.max_per_page'  # (int)
 HIDE_SHORT_VIDEOS = 'youtube.hide_shorts'  # (bool)
+SUBSCRIPTIONS_PER_CHANNEL = 'youtube.folder.my_subscriptions.per_channel'  # (int)
 
 SAFE_SEARCH = 'kodion.safe.search'  # (int)
 AGE_GATE = 'kodion.age.gate'  # (bool)
@@ -52,6 +53,7 @@ USE_REMOTE_HISTORY = 'kodion.history.remote'  # (bool)
 
 SEARCH_SIZE = 'kodion.search.size'  # (int)
 CACHE_SIZE = 'kodion.cache.size'  # (int)
+CONSOLIDATED_STORAGE = 'kodion.storage.consolidated'  # (bool)
 
 DETAILED_DESCRIPTION = 'youtube.view.description.details'  # (bool)
 DETAILED_LABELS = 'youtube.view.label.details'  # (bool)
@@ -74,3 +76,4 @@ READ_TIMEOUT = 'requests.timeout.read'  # (int)
 HTTPD_PORT = 'kodion.http.port'  # (number)
 HTTPD_LISTEN = 'kodion.http.listen'  # (string)
 HTTPD_WHITELIST = 'kodion.http.ip.whitelist'  # (string)
+HTTPD_GATEWAY = 'kodion.http.gateway'  # (bool)
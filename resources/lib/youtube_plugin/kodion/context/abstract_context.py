@@ -93,6 +93,19 @@ class AbstractContext(object):
         'visitor',
     }
 
+    # {name: (storage class, database filename)}
+    # When storage is consolidated, every storage uses a table, named as per
+    # the storage name, in a single database file.
+    _STORAGE = {
+        'data_cache': (DataCache, 'data_cache.sqlite'),
+        'favorites': (FavoriteList, 'favorites.sqlite'),
+        'function_cache': (FunctionCache, 'cache.sqlite'),
+        'playback_history': (PlaybackHistory, 'history.sqlite'),
+        'search_history': (SearchHistory, 'search.sqlite'),
+        'watch_later': (WatchLaterList, 'watch_later.sqlite'),
+    }
+    _CONSOLIDATED_STORAGE = 'storage.sqlite'
+
     def __init__(self, path='/', params=None, plugin_name='', plugin_id=''):
         if not params:
             params = {}
@@ -106,6 +119,7 @@ class AbstractContext(object):
         self._playback_history = None
         self._favorite_list = None
         self._watch_later_list = None
+        self._storage_migrated = False
         self._access_manager = None
 
         self._plugin_name = str(plugin_name)
@@ -142,60 +156,95 @@ class AbstractContext(object):
 
     def get_playback_history(self):
         if not self._playback_history:
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'history.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._playback_history = PlaybackHistory(filepath)
+            self._playback_history = self._get_storage('playback_history')
         return self._playback_history
 
     def get_data_cache(self):
         if not self._data_cache:
             settings = self.get_settings()
             cache_size = settings.cache_size() / 2
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'data_cache.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._data_cache = DataCache(filepath, max_file_size_mb=cache_size)
+            self._data_cache = self._get_storage('data_cache',
+                                                 max_file_size_mb=cache_size)
         return self._data_cache
 
     def get_function_cache(self):
         if not self._function_cache:
             settings = self.get_settings()
             cache_size = settings.cache_size() / 2
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'cache.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._function_cache = FunctionCache(filepath,
-                                                 max_file_size_mb=cache_size)
+            self._function_cache = self._get_storage(
+                'function_cache', max_file_size_mb=cache_size
+            )
         return self._function_cache
 
     def get_search_history(self):
         if not self._search_history:
             settings = self.get_settings()
             search_size = settings.get_int(settings.SEARCH_SIZE, 50)
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'search.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._search_history = SearchHistory(filepath,
-                                                 max_item_count=search_size)
+            self._search_history = self._get_storage(
+                'search_history', max_item_count=search_size
+            )
         return self._search_history
 
     def get_favorite_list(self):
         if not self._favorite_list:
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'favorites.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._favorite_list = FavoriteList(filepath)
+            self._favorite_list = self._get_storage('favorites')
         return self._favorite_list
 
     def get_watch_later_list(self):
         if not self._watch_later_list:
-            uuid = self.get_access_manager().get_current_user_id()
-            filename = 'watch_later.sqlite'
-            filepath = os.path.join(self.get_data_path(), uuid, filename)
-            self._watch_later_list = WatchLaterList(filepath)
+            self._watch_later_list = self._get_storage('watch_later')
         return self._watch_later_list
 
+    def _get_storage(self, name, **kwargs):
+        storage_class, filename = self._STORAGE[name]
+        uuid = self.get_access_manager().get_current_user_id()
+        user_path = os.path.join(self.get_data_path(), uuid)
+        consolidated = self.get_settings().use_consolidated_storage()
+        if not self._storage_migrated:
+            self._migrate_storage(user_path, consolidated)
+
+        if consolidated:
+            filepath = os.path.join(user_path, self._CONSOLIDATED_STORAGE)
+            return storage_class(filepath, table_name=name, **kwargs)
+        filepath = os.path.join(user_path, filename)
+        return storage_class(filepath, **kwargs)
+
+    def _migrate_storage(self, user_path, consolidated):
+        """
+        Moves the items of each storage into the consolidated database, or
+        back into separate databases, if the storage setting has changed
+        """
+        self._storage_migrated = True
+        consolidated_filepath = os.path.join(user_path,
+                                             self._CONSOLIDATED_STORAGE)
+        if not consolidated and not os.path.exists(consolidated_filepath):
+            return
+
+        sources = []
+        for name, (storage_class, filename) in self._STORAGE.items():
+            filepath = os.path.join(user_path, filename)
+            if consolidated:
+                if not os.path.exists(filepath):
+                    continue
+                source = storage_class(filepath)
+                target = storage_class(consolidated_filepath, table_name=name)
+            else:
+                source = storage_class(consolidated_filepath, table_name=name)
+                target = storage_class(filepath)
+            num_items = target.import_from(source)
+            sources.append(source)
+            self.log_debug('Storage migration - {name}: {num} items moved'
+                           .format(name=name, num=num_items))
+
+        for source in sources:
+            if source.delete():
+                continue
+            # The file may still be open in another process, e.g. the
+            # service, and is deleted when next migrated. Items are removed
+            # now, so that items removed after the migration are not
+            # restored by the next migration.
+            source.clear()
+
     def get_access_manager(self):
         if not self._access_manager:
             self._access_manager = AccessManager(self)
@@ -349,8 +398,8 @@ class AbstractContext(object):
     def add_sort_method(self, *sort_methods):
         raise NotImplementedError()
 
-    def log(self, text, log_level=logger.NOTICE):
-        logger.log(text, log_level, self.get_id())
+    def log(self, text, log_level=logger.NOTICE, **kwargs):
+        logger.log(text, log_level, self.get_id(), **kwargs)
 
     def log_warning(self, text):
         self.log(text, logger.WARNING)
@@ -361,8 +410,8 @@ class AbstractContext(object):
     def log_notice(self, text):
         self.log(text, logger.NOTICE)
 
-    def log_debug(self, text):
-        self.log(text, logger.DEBUG)
+    def log_debug(self, text, **kwargs):
+        self.log(text, logger.DEBUG, **kwargs)
 
     def log_info(self, text):
         self.log(text, logger.INFO)
@@ -370,6 +419,30 @@ class AbstractContext(object):
     def clone(self, new_path=None, new_params=None):
         raise NotImplementedError()
 
+    def tear_down(self):
+        for storage in (self._function_cache,
+                        self._data_cache,
+                        self._search_history,
+                        self._playback_history,
+                        self._favorite_list,
+                        self._watch_later_list):
+            if storage:
+                storage.close()
+
+    def reset_storage(self):
+        """
+        Closes all storages, which are then opened again, and migrated if the
+        storage setting has changed, when next used
+        """
+        self.tear_down()
+        self._function_cache = None
+        self._data_cache = None
+        self._search_history = None
+        self._playback_history = None
+        self._favorite_list = None
+        self._watch_later_list = None
+        self._storage_migrated = False
+
     @staticmethod
     def execute(command):
         raise NotImplementedError()
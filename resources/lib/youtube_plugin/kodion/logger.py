@@ -10,6 +10,8 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+from time import time
+
 from .compatibility import xbmc, xbmcaddon
 from .constants import ADDON_ID
 
@@ -24,15 +26,58 @@ SEVERE = xbmc.LOGSEVERE
 NONE = xbmc.LOGNONE
 
 
-def log(text, log_level=DEBUG, addon_id=ADDON_ID):
+# Time, in seconds, that the state of the Kodi debug logging setting is
+# cached for, so that long running processes, e.g. the service, follow changes
+DEBUG_CHECK_INTERVAL = 10
+
+_STATE = {
+    'debug_enabled': None,
+    'debug_checked': 0,
+}
+
+
+def debug_enabled(refresh=False):
+    """
+    Checks if Kodi debug logging is enabled. The result is cached for
+    DEBUG_CHECK_INTERVAL seconds, so this is cheap enough to call before
+    building any debug log message.
+    :param refresh: bool, check the current value of the Kodi setting
+    """
+    enabled = _STATE['debug_enabled']
+    now = time()
+    if (refresh or enabled is None
+            or now - _STATE['debug_checked'] > DEBUG_CHECK_INTERVAL):
+        enabled = bool(xbmc.getCondVisibility(
+            'System.GetBool(debug.showloginfo)'
+        ))
+        _STATE['debug_enabled'] = enabled
+        _STATE['debug_checked'] = now
+    return enabled
+
+
+def log(text, log_level=DEBUG, addon_id=ADDON_ID, **kwargs):
+    """
+    :param text: str, or a callable returning the str to log. Callables are
+                 only called, and str.format is only applied, if the message
+                 will be logged
+    :param log_level: Kodi log level
+    :param addon_id: id of the add-on to prefix the log line with
+    :param kwargs: keyword arguments used to format text
+    """
+    if log_level == DEBUG and not debug_enabled():
+        return
     if not addon_id:
         addon_id = xbmcaddon.Addon().getAddonInfo('id')
+    if callable(text):
+        text = text()
+    elif kwargs:
+        text = text.format(**kwargs)
     log_line = '[%s] %s' % (addon_id, text)
     xbmc.log(msg=log_line, level=log_level)
 
 
-def log_debug(text, addon_id=ADDON_ID):
-    log(text, DEBUG, addon_id)
+def log_debug(text, addon_id=ADDON_ID, **kwargs):
+    log(text, DEBUG, addon_id, **kwargs)
 
 
 def log_info(text, addon_id=ADDON_ID):
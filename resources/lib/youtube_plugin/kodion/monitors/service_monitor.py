@@ -24,9 +24,13 @@ class ServiceMonitor(xbmc.Monitor):
     _settings_changes = 0
     _settings_state = None
 
-    def __init__(self):
+    def __init__(self, context=None):
+        self._context = context
         settings = self._settings
-        self._use_httpd = settings.use_isa() or settings.api_config_page()
+        self._consolidated_storage = settings.use_consolidated_storage()
+        self._use_httpd = (settings.use_isa()
+                           or settings.api_config_page()
+                           or settings.httpd_gateway())
         address, port = get_connect_address()
         self._old_httpd_address = self._httpd_address = address
         self._old_httpd_port = self._httpd_port = port
@@ -83,7 +87,17 @@ class ServiceMonitor(xbmc.Monitor):
                     'plugin://{0}/'.format(ADDON_ID))):
             xbmc.executebuiltin('Container.Refresh')
 
-        use_httpd = settings.use_isa() or settings.api_config_page()
+        # Storages used by the service, e.g. the playback history, are opened
+        # again in the new location
+        consolidated_storage = settings.use_consolidated_storage()
+        if consolidated_storage != self._consolidated_storage:
+            self._consolidated_storage = consolidated_storage
+            if self._context:
+                self._context.reset_storage()
+
+        use_httpd = (settings.use_isa()
+                     or settings.api_config_page()
+                     or settings.httpd_gateway())
         address, port = get_connect_address()
         whitelist = settings.httpd_whitelist()
 
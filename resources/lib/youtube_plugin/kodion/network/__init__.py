@@ -9,6 +9,7 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+from .fetch_pool import FetchPool
 from .http_server import (
     get_client_ip_address,
     get_connect_address,
@@ -17,6 +18,8 @@ from .http_server import (
 )
 from .ip_api import Locator
 from .requests import BaseRequestsClass, InvalidJSONError
+from .retry_policy import CircuitBreakerOpen, RetryPolicy
+from .validator_cache import ValidatorCache
 
 
 __all__ = (
@@ -25,6 +28,10 @@ __all__ = (
     'get_http_server',
     'httpd_status',
     'BaseRequestsClass',
+    'CircuitBreakerOpen',
+    'FetchPool',
     'InvalidJSONError',
     'Locator',
+    'RetryPolicy',
+    'ValidatorCache',
 )
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+from collections import deque
+from threading import Condition, Event, Thread
+from time import time
+from traceback import format_exc
+
+from .requests import BaseRequestsClass
+from ..compatibility import xbmc
+from ..logger import log_error
+
+
+__all__ = (
+    'FetchPool',
+    'FetchTask',
+)
+
+
+class FetchTask(object):
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    CANCELLED = 3
+
+    def __init__(self, func, args, kwargs, host=None, priority=0):
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self.host = host
+        self.priority = priority
+
+        self.state = self.PENDING
+        self.result = None
+        self.exc = None
+        self._event = Event()
+
+    def run(self):
+        try:
+            self.result = self._func(*self._args, **self._kwargs)
+        except Exception as exc:
+            self.exc = exc
+            log_error('FetchTask.run - {exc}:\n{details}'.format(
+                exc=exc, details=format_exc()
+            ))
+        finally:
+            self.state = self.DONE
+            self._event.set()
+
+    def cancel(self):
+        self.state = self.CANCELLED
+        self._event.set()
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the task to complete or be cancelled
+        :param timeout: maximum time to wait, in seconds
+        :return: True if the task is no longer running, False otherwise
+        """
+        return self._event.wait(timeout)
+
+
+class FetchPool(object):
+    """
+    Pool of worker threads used to run many requests concurrently.
+
+    At most max_workers tasks are run at a time, defaulting to the number of
+    connections kept by BaseRequestsClass, and at most per_host tasks for the
+    same host. Within these limits the number of concurrent tasks is adjusted
+    by additive increase and multiplicative decrease, based on the time taken
+    by, and errors raised or returned by, each task.
+
+    Queued tasks are run in order of priority, lowest value first, and then
+    in the order they were submitted.
+
+    Pending tasks are cancelled if Kodi requests the add-on to abort.
+    Worker threads are started as required and end when there are no more
+    tasks to run.
+    """
+
+    # Task durations longer than this multiple of the average duration reduce
+    # the number of concurrent tasks
+    LATENCY_FACTOR = 2
+    # Weight of each task duration in the average duration
+    LATENCY_WEIGHT = 0.2
+    # Interval, in seconds, of checks for abort requests while waiting
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, max_workers=None, per_host=None, is_error=None):
+        """
+        :param max_workers: maximum number of tasks run at the same time
+        :param per_host: maximum number of tasks run at the same time for the
+                         same host
+        :param is_error: function used to check if the value returned by a
+                         task is an error, in addition to raised exceptions
+        """
+        if not max_workers:
+            max_workers = BaseRequestsClass.POOL_MAXSIZE
+        self._max_workers = max_workers
+        self._per_host = per_host or max_workers
+        self._is_error = is_error
+
+        # Number of concurrent tasks, starting from half the maximum
+        self._limit = max(1.0, max_workers / 2)
+        self._latency = None
+
+        self._queue = []
+        self._completed = deque()
+        self._hosts = {}
+        self._running = 0
+        self._workers = 0
+        self._aborted = False
+        self._condition = Condition()
+        self._monitor = xbmc.Monitor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        if exc_type:
+            self.cancel()
+        else:
+            self.join()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Adds a task to be run by the pool
+        :param func: function to run
+        :param args: positional arguments of the function
+        :param kwargs: keyword arguments of the function
+        :param _host: str, name of the host the task makes requests to
+        :param _priority: int, priority of the task, lowest value run first
+        :return: FetchTask
+        """
+        host = kwargs.pop('_host', None)
+        priority = kwargs.pop('_priority', 0)
+        task = FetchTask(func, args, kwargs, host, priority)
+        with self._condition:
+            if self._aborted:
+                task.cancel()
+                return task
+            queue = self._queue
+            index = len(queue)
+            while index and queue[index - 1].priority > priority:
+                index -= 1
+            queue.insert(index, task)
+            self._start_workers()
+            self._condition.notify()
+        return task
+
+    def map(self, func, iterable, host=None):
+        """
+        Runs func for each item of iterable, using the pool
+        :param func: function to run, taking a single argument
+        :param iterable: arguments of each function call
+        :param host: str, name of the host the tasks make requests to
+        :return: list of results, in the order of iterable, with None for
+                 tasks that failed or were cancelled
+        """
+        tasks = [self.submit(func, item, _host=host) for item in iterable]
+        self.join(tasks)
+        return [task.result for task in tasks]
+
+    def join(self, tasks=None):
+        """
+        Waits for tasks to complete, or be cancelled
+        :param tasks: tasks to wait for, or None to wait for all tasks
+        :return: True if all tasks completed, False if cancelled by an abort
+        """
+        if tasks is None:
+            while 1:
+                with self._condition:
+                    if not self._queue and not self._running:
+                        break
+                    self._condition.wait(self.POLL_INTERVAL)
+                if self._check_abort():
+                    return False
+            return True
+
+        for task in tasks:
+            while not task.wait(self.POLL_INTERVAL):
+                if self._check_abort():
+                    return False
+        return not self._aborted
+
+    def next_completed(self, timeout=None):
+        """
+        Waits for the next task to be completed, in order of completion
+        :param timeout: maximum time to wait, in seconds
+        :return: FetchTask, or None if no task was completed before the
+                 timeout, no tasks remain, or cancelled by an abort
+        """
+        end_time = None if timeout is None else time() + timeout
+        while 1:
+            with self._condition:
+                if self._completed:
+                    return self._completed.popleft()
+                if not self._queue and not self._running:
+                    return None
+                wait_time = self.POLL_INTERVAL
+                if end_time is not None:
+                    wait_time = min(wait_time, end_time - time())
+                    if wait_time <= 0:
+                        return None
+                self._condition.wait(wait_time)
+            if self._check_abort():
+                return None
+
+    def cancel(self):
+        with self._condition:
+            while self._queue:
+                self._queue.pop().cancel()
+            self._condition.notify_all()
+
+    def _check_abort(self):
+        if self._aborted:
+            return True
+        if not self._monitor.abortRequested():
+            return False
+        with self._condition:
+            self._aborted = True
+        self.cancel()
+        return True
+
+    def _start_workers(self):
+        num_workers = min(self.limit, self._running + len(self._queue))
+        while self._workers < num_workers:
+            self._workers += 1
+            thread = Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+
+    def _next_task(self):
+        if self._running >= self.limit:
+            return None
+        hosts = self._hosts
+        per_host = self._per_host
+        for task in self._queue:
+            if not task.host or hosts.get(task.host, 0) < per_host:
+                self._queue.remove(task)
+                return task
+        return None
+
+    def _worker(self):
+        condition = self._condition
+        while 1:
+            with condition:
+                while 1:
+                    if not self._queue or self._workers > self.limit:
+                        self._workers -= 1
+                        condition.notify_all()
+                        return
+                    task = self._next_task()
+                    if task:
+                        break
+                    condition.wait(self.POLL_INTERVAL)
+                self._running += 1
+                host = task.host
+                if host:
+                    self._hosts[host] = self._hosts.get(host, 0) + 1
+
+            if self._check_abort():
+                task.cancel()
+                failed = True
+                duration = 0
+            else:
+                task.state = task.RUNNING
+                start_time = time()
+                task.run()
+                duration = time() - start_time
+                failed = task.exc is not None or bool(
+                    self._is_error and self._is_error(task.result)
+                )
+
+            with condition:
+                self._running -= 1
+                if host:
+                    self._hosts[host] -= 1
+                if task.state == task.DONE:
+                    self._completed.append(task)
+                self._adjust_limit(duration, failed)
+                self._start_workers()
+                condition.notify_all()
+
+    def _adjust_limit(self, duration, failed):
+        latency = self._latency
+        if failed:
+            self._limit = max(1.0, self._limit / 2)
+            return
+        if latency is None:
+            self._latency = duration
+            return
+        self._latency = latency + self.LATENCY_WEIGHT * (duration - latency)
+        if duration > self.LATENCY_FACTOR * latency:
+            self._limit = max(1.0, self._limit * 0.75)
+        else:
+            self._limit = min(self._max_workers,
+                              self._limit + 1.0 / self._limit)
@@ -13,13 +13,18 @@ import json
 import os
 import re
 import socket
+from collections import OrderedDict
 from io import open
 from textwrap import dedent
+from threading import Lock
+from time import time
 
 from .requests import BaseRequestsClass
 from ..compatibility import (
     BaseHTTPServer,
+    ThreadingMixIn,
     parse_qs,
+    urljoin,
     urlsplit,
     xbmc,
     xbmcaddon,
@@ -39,7 +44,55 @@ _addon_name = _addon.getAddonInfo('name')
 _addon_icon = _addon.getAddonInfo('icon')
 del _addon
 
-_server_requests = BaseRequestsClass()
+_server_requests = BaseRequestsClass(gateway=False)
+
+
+class GatewayCache(object):
+    """
+    Least recently used cache of successful GET responses proxied by the
+    gateway, bounded by number of entries and size in bytes.
+    """
+
+    def __init__(self, max_items=200, max_bytes=16 * 1024 * 1024, seconds=60):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._seconds = seconds
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.pop(key, None)
+            if not entry:
+                return None
+            if entry[0] < time():
+                self._bytes -= len(entry[3])
+                return None
+            self._items[key] = entry
+        return entry
+
+    def set(self, key, status_code, headers, content):
+        size = len(content)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old_entry = self._items.pop(key, None)
+            if old_entry:
+                self._bytes -= len(old_entry[3])
+            self._items[key] = (time() + self._seconds,
+                                status_code,
+                                headers,
+                                content)
+            self._bytes += size
+
+            while (len(self._items) > self._max_items
+                   or self._bytes > self._max_bytes):
+                _, old_entry = self._items.popitem(last=False)
+                self._bytes -= len(old_entry[3])
+
+
+_gateway_cache = GatewayCache()
 
 
 class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler, object):
@@ -225,6 +278,9 @@ class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler, object):
         if not self.connection_allowed():
             self.send_error(403)
 
+        elif self.path.startswith(paths.GATEWAY):
+            self.gateway_request()
+
         elif self.path.startswith(paths.DRM):
             home = xbmcgui.Window(10000)
 
@@ -310,6 +366,163 @@ class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler, object):
     def log_message(self, format, *args):
         return
 
+    # Only requests to these domains are forwarded by the gateway
+    GATEWAY_HOSTS = (
+        'google.com',
+        'googleapis.com',
+        'youtube.com',
+    )
+    # Arguments of a gateway request that are forwarded upstream
+    GATEWAY_REQUEST_KEYS = ('headers', 'params', 'data', 'json')
+    GATEWAY_MAX_REDIRECTS = 5
+    # Response headers that no longer apply to the decoded response content
+    GATEWAY_SKIP_HEADERS = frozenset((
+        'connection',
+        'content-encoding',
+        'content-length',
+        'keep-alive',
+        'transfer-encoding',
+    ))
+
+    @classmethod
+    def is_gateway_url(cls, url):
+        """
+        :param url: url of a request to be forwarded by the gateway
+        :return: True if the url uses https, on the default port, to one of
+                 GATEWAY_HOSTS or one of their subdomains, False otherwise
+        """
+        try:
+            url_components = urlsplit(url)
+            port = url_components.port
+        except ValueError:
+            return False
+        host = url_components.hostname
+        if url_components.scheme != 'https' or not host or port is not None:
+            return False
+        host = host.lower().rstrip('.')
+        return any(host == gateway_host
+                   or host.endswith('.' + gateway_host)
+                   for gateway_host in cls.GATEWAY_HOSTS)
+
+    def is_loopback(self):
+        client_ip = self.client_address[0]
+        if client_ip.startswith('::ffff:'):
+            client_ip = client_ip[len('::ffff:'):]
+        return client_ip == '::1' or client_ip.startswith('127.')
+
+    def gateway_request(self):
+        # The gateway is only used by the plugin, and is not a proxy for
+        # other hosts on the network
+        if not self.is_loopback():
+            self.send_error(403)
+            return
+
+        try:
+            length = int(self.headers['Content-Length'])
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            method = request['method'].upper()
+            url = request['url']
+            allow_redirects = request.get('allow_redirects', True)
+            timeout = request.get('timeout')
+            if isinstance(timeout, list):
+                timeout = tuple(timeout)
+            request = {
+                key: request[key]
+                for key in self.GATEWAY_REQUEST_KEYS
+                if request.get(key) is not None
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.send_error(400)
+            return
+
+        if not self.is_gateway_url(url):
+            self.send_error(403)
+            return
+
+        # Responses for signed in users are not cached, as they can change
+        # following actions taken in the plugin
+        if method == 'GET' and 'Authorization' not in (
+                request.get('headers') or {}):
+            cache_key = json.dumps((url, allow_redirects, request),
+                                   sort_keys=True)
+            cached = _gateway_cache.get(cache_key)
+        else:
+            cache_key = cached = None
+
+        if cached:
+            _, status_code, headers, content = cached
+            cache_status = 'hit'
+        else:
+            response = self._gateway_fetch(method,
+                                           url,
+                                           timeout,
+                                           allow_redirects,
+                                           request)
+            if response is None:
+                self.send_response(502)
+                self.send_header('X-Gateway-Error', 'true')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            status_code = response.status_code
+            content = response.content
+            headers = [('X-Gateway-Url', response.url)]
+            headers.extend(
+                (header, value)
+                for header, value in response.headers.items()
+                if header.lower() not in self.GATEWAY_SKIP_HEADERS
+            )
+            if cache_key and status_code == 200:
+                _gateway_cache.set(cache_key, status_code, headers, content)
+            cache_status = 'miss'
+
+        self.send_response(status_code)
+        for header, value in headers:
+            self.send_header(header, value)
+        self.send_header('X-Gateway-Cache', cache_status)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+
+        for chunk in self.get_chunks(content):
+            self.wfile.write(chunk)
+
+    def _gateway_fetch(self, method, url, timeout, allow_redirects, request):
+        """
+        Makes a gateway request upstream, following redirects only to urls
+        that are allowed by is_gateway_url.
+        :return: requests.Response, or None if the request failed or was
+                 redirected to a url that is not allowed
+        """
+        for _ in range(self.GATEWAY_MAX_REDIRECTS + 1):
+            response = _server_requests.request(
+                url,
+                method=method,
+                timeout=timeout,
+                allow_redirects=False,
+                response_hook=lambda response: response,
+                # Retried by the plugin according to the RetryPolicy
+                retry=False,
+                **request
+            )
+            if (response is None
+                    or not allow_redirects
+                    or not response.is_redirect):
+                return response
+
+            url = urljoin(response.url, response.headers['location'])
+            if not self.is_gateway_url(url):
+                log_error('HTTPServer - Gateway redirect not allowed: |{url}|'
+                          .format(url=url))
+                return None
+            # Same method changes as made by requests.Session
+            if response.status_code == 303 and method != 'HEAD' or (
+                    response.status_code in (301, 302) and method == 'POST'):
+                method = 'GET'
+                request.pop('data', None)
+                request.pop('json', None)
+        return None
+
     def get_chunks(self, data):
         for i in range(0, len(data), self.chunk_size):
             yield data[i:i + self.chunk_size]
@@ -533,9 +746,13 @@ class Pages(object):
     }
 
 
+class HTTPServer(ThreadingMixIn, BaseHTTPServer.HTTPServer, object):
+    daemon_threads = True
+
+
 def get_http_server(address, port):
     try:
-        server = BaseHTTPServer.HTTPServer((address, port), RequestHandler)
+        server = HTTPServer((address, port), RequestHandler)
         return server
     except socket.error as exc:
         log_error('HTTPServer: Failed to start |{address}:{port}| |{response}|'
@@ -10,14 +10,24 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import atexit
+from copy import deepcopy
+from threading import Event, Lock
+from time import time
 from traceback import format_stack
 
 from requests import Session
 from requests.adapters import HTTPAdapter, Retry
-from requests.exceptions import InvalidJSONError, RequestException
+from requests.exceptions import (
+    ConnectionError as RequestsConnectionError,
+    InvalidJSONError,
+    RequestException,
+    Timeout,
+)
 
-from ..compatibility import xbmcaddon
-from ..constants import ADDON_ID
+from .retry_policy import CircuitBreakerOpen, RetryPolicy
+from .transport import get_transport_adapter
+from ..compatibility import string_type, xbmc, xbmcaddon
+from ..constants import ADDON_ID, paths
 from ..logger import log_error
 from ..settings import XbmcPluginSettings
 
@@ -30,25 +40,83 @@ __all__ = (
 _settings = XbmcPluginSettings(xbmcaddon.Addon(id=ADDON_ID))
 
 
+class _Flight(object):
+    def __init__(self):
+        self.result = None
+        self.exc = None
+        self._event = Event()
+
+    def finish(self, result=None, exc=None):
+        self.result = result
+        self.exc = exc
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self.exc:
+            raise self.exc
+        # Each caller gets its own copy of decoded data, which can be modified
+        if isinstance(self.result, (dict, list)):
+            return deepcopy(self.result)
+        return self.result
+
+
 class BaseRequestsClass(object):
+    POOL_MAXSIZE = 10
+
+    # Only connection errors are retried by the adapter. Error responses are
+    # retried according to the RetryPolicy of the endpoint
     _http_adapter = HTTPAdapter(
-        pool_maxsize=10,
+        pool_maxsize=POOL_MAXSIZE,
         pool_block=True,
         max_retries=Retry(
             total=3,
             backoff_factor=0.1,
-            status_forcelist={500, 502, 503, 504},
             allowed_methods=None,
+            # Retry-After headers of 413, 429 and 503 responses are otherwise
+            # respected, regardless of status_forcelist
+            status=0,
+            respect_retry_after_header=False,
+            raise_on_status=False,
         )
     )
 
+    # Records or replays responses for testing, if enabled by environment
+    # variables. See transport.py
+    _transport_adapter = get_transport_adapter(
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=_http_adapter.max_retries,
+    )
+
     _session = Session()
-    _session.mount('https://', _http_adapter)
+    _session.mount('https://', _transport_adapter or _http_adapter)
     atexit.register(_session.close)
 
-    def __init__(self, exc_type=None):
+    _flights = {}
+    _flights_lock = Lock()
+
+    # Time, in seconds, to make direct requests for after the gateway could
+    # not be reached
+    GATEWAY_RETRY_DELAY = 60
+    _gateway_retry_at = 0
+
+    def __init__(self, exc_type=None, gateway=None):
         self._verify = _settings.verify_ssl()
         self._timeout = _settings.get_timeout()
+        if gateway is None:
+            gateway = _settings.httpd_gateway()
+        if gateway:
+            address = _settings.httpd_listen()
+            if address == '0.0.0.0':
+                address = '127.0.0.1'
+            self._gateway_url = 'http://{address}:{port}{path}'.format(
+                address=address,
+                port=_settings.httpd_port(),
+                path=paths.GATEWAY,
+            )
+        else:
+            self._gateway_url = None
         if isinstance(exc_type, tuple):
             self._default_exc = (RequestException,) + exc_type
         elif exc_type:
@@ -76,7 +144,70 @@ class BaseRequestsClass(object):
                 response_hook_kwargs=None,
                 error_hook=None,
                 error_hook_kwargs=None,
+                # Conditional requests using stored ETag and Last-Modified
+                # response headers. See validator_cache.py
+                validator_cache=None,
+                # Identical concurrent requests are only made once, with all
+                # callers receiving the result of the first request
+                coalesce=False,
+                # Retry error responses according to the RetryPolicy for url
+                retry=True,
                 error_title=None, error_info=None, raise_exc=False, **_):
+        if coalesce:
+            key = (method.upper(),
+                   url,
+                   repr(sorted(params.items())) if params else None,
+                   repr(data),
+                   repr(json),
+                   repr(sorted(headers.items())) if headers else None)
+            with self._flights_lock:
+                flight = self._flights.get(key)
+                if flight:
+                    leader = False
+                else:
+                    leader = True
+                    flight = self._flights[key] = _Flight()
+            if not leader:
+                return flight.wait()
+
+            try:
+                result = self.request(url, method=method,
+                                      params=params,
+                                      data=data,
+                                      headers=headers,
+                                      cookies=cookies,
+                                      files=files,
+                                      auth=auth,
+                                      timeout=timeout,
+                                      allow_redirects=allow_redirects,
+                                      proxies=proxies,
+                                      hooks=hooks,
+                                      stream=stream,
+                                      verify=verify,
+                                      cert=cert,
+                                      json=json,
+                                      response_hook=response_hook,
+                                      response_hook_kwargs=response_hook_kwargs,
+                                      error_hook=error_hook,
+                                      error_hook_kwargs=error_hook_kwargs,
+                                      validator_cache=validator_cache,
+                                      retry=retry,
+                                      error_title=error_title,
+                                      error_info=error_info,
+                                      raise_exc=raise_exc)
+            except Exception as exc:
+                flight.finish(exc=exc)
+                raise
+            else:
+                flight.finish(result=result)
+                # Return a copy, as waiting callers may still be copying result
+                if isinstance(result, (dict, list)):
+                    result = deepcopy(result)
+                return result
+            finally:
+                with self._flights_lock:
+                    del self._flights[key]
+
         if timeout is None:
             timeout = self._timeout
         if verify is None:
@@ -84,26 +215,73 @@ class BaseRequestsClass(object):
         if allow_redirects is None:
             allow_redirects = True
 
+        if validator_cache:
+            cache_key, cache_entry, headers = validator_cache.prepare(
+                method, url, params, headers
+            )
+        else:
+            cache_key = cache_entry = None
+
+        # The gateway always verifies certificates
+        use_gateway = self._gateway_url and verify is True and not (
+                cookies or files or auth or proxies or hooks or stream or cert
+        )
+        policy = RetryPolicy.for_url(url) if retry else None
+
         response = None
         try:
-            response = self._session.request(method, url,
-                                             params=params,
-                                             data=data,
-                                             headers=headers,
-                                             cookies=cookies,
-                                             files=files,
-                                             auth=auth,
-                                             timeout=timeout,
-                                             allow_redirects=allow_redirects,
-                                             proxies=proxies,
-                                             hooks=hooks,
-                                             stream=stream,
-                                             verify=verify,
-                                             cert=cert,
-                                             json=json)
+            if policy:
+                policy.check()
+
+            attempt = 0
+            while 1:
+                response = None
+                if use_gateway:
+                    response = self._gateway_request(
+                        method, url,
+                        params=params,
+                        data=data,
+                        headers=headers,
+                        timeout=timeout,
+                        allow_redirects=allow_redirects,
+                        json=json,
+                    )
+                if response is None:
+                    response = self._session.request(
+                        method, url,
+                        params=params,
+                        data=data,
+                        headers=headers,
+                        cookies=cookies,
+                        files=files,
+                        auth=auth,
+                        timeout=timeout,
+                        allow_redirects=allow_redirects,
+                        proxies=proxies,
+                        hooks=hooks,
+                        stream=stream,
+                        verify=verify,
+                        cert=cert,
+                        json=json,
+                    )
+                if not policy:
+                    break
+                delay = policy.get_delay(attempt, response)
+                if delay is None or xbmc.Monitor().waitForAbort(delay):
+                    break
+                attempt += 1
+
+            if policy:
+                policy.record(response)
+
             if not getattr(response, 'status_code', None):
                 raise self._default_exc[0](response=response)
 
+            if cache_key:
+                response = validator_cache.update(cache_key,
+                                                  cache_entry,
+                                                  response)
+
             if response_hook:
                 if response_hook_kwargs is None:
                     response_hook_kwargs = {}
@@ -113,6 +291,10 @@ class BaseRequestsClass(object):
                 response.raise_for_status()
 
         except self._default_exc as exc:
+            if (policy and response is None
+                    and not isinstance(exc, CircuitBreakerOpen)):
+                policy.record()
+
             exc_response = exc.response or response
             response_text = exc_response and exc_response.text
             stack_trace = format_stack()
@@ -181,3 +363,38 @@ class BaseRequestsClass(object):
                 raise exc
 
         return response
+
+    def _gateway_request(self, method, url, **kwargs):
+        """
+        Forwards a request to the gateway of the service HTTP server, which
+        keeps connections to upstream hosts open between plugin invocations.
+        :return: requests.Response, or None if the request should be made
+                 directly instead
+        """
+        if BaseRequestsClass._gateway_retry_at > time():
+            return None
+        data = kwargs.get('data')
+        if data is not None and not isinstance(data, (dict, string_type)):
+            return None
+
+        kwargs['method'] = method
+        kwargs['url'] = url
+        try:
+            # Redirects are followed by the gateway, if allowed
+            response = self._session.post(self._gateway_url,
+                                          json=kwargs,
+                                          timeout=kwargs['timeout'],
+                                          allow_redirects=False)
+        except (RequestsConnectionError, Timeout) as exc:
+            log_error('BaseRequestsClass._gateway_request - '
+                      'Gateway unavailable, using direct requests: {exc}'
+                      .format(exc=exc))
+            BaseRequestsClass._gateway_retry_at = (
+                    time() + self.GATEWAY_RETRY_DELAY
+            )
+            return None
+
+        if response.headers.get('X-Gateway-Error'):
+            return None
+        response.url = response.headers.get('X-Gateway-Url', url)
+        return response
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import re
+from email.utils import mktime_tz, parsedate_tz
+from random import uniform
+from threading import Lock
+from time import time
+
+from requests.exceptions import RequestException
+
+from ..compatibility import xbmcgui
+from ..constants import ADDON_ID
+from ..logger import log_debug, log_error
+
+
+__all__ = (
+    'CircuitBreakerOpen',
+    'RetryPolicy',
+)
+
+
+class CircuitBreakerOpen(RequestException):
+    pass
+
+
+class RetryPolicy(object):
+    """
+    Retry and circuit breaker policy of an API endpoint.
+
+    Requests that fail with one of the retry statuses are retried up to total
+    times, with exponential backoff and random jitter, or after the delay
+    given in a Retry-After response header.
+
+    After failure_threshold consecutive failed requests, or a Retry-After
+    delay longer than backoff_max, further requests to the endpoint fail
+    immediately until the cooldown period has passed. Circuit breaker state is
+    kept in a Kodi window property, so it is shared between plugin
+    invocations and the service.
+    """
+
+    _PROPERTY_ID = '-'.join((ADDON_ID, 'circuit_breakers'))
+    _ENDPOINT_RE = re.compile(
+        r'/(?:youtubei/v1|youtube/v3)/(?P<endpoint>[^/?]+)'
+        r'|/(?P<feeds>feeds)/'
+    )
+
+    _failures = {}
+    _lock = Lock()
+    _policies = {}
+
+    def __init__(self,
+                 name,
+                 total=3,
+                 backoff_factor=0.1,
+                 backoff_max=10,
+                 jitter=0.5,
+                 statuses=frozenset((429, 500, 502, 503, 504)),
+                 failure_threshold=0,
+                 cooldown=60):
+        """
+        :param name: name of the endpoint
+        :param total: maximum number of retries
+        :param backoff_factor: delay before the first retry, in seconds
+        :param backoff_max: maximum delay before a retry, in seconds
+        :param jitter: maximum random variation of the delay, as a fraction
+        :param statuses: response status codes that are retried
+        :param failure_threshold: number of consecutive failed requests that
+                                  open the circuit breaker, 0 to disable
+        :param cooldown: time the circuit breaker remains open, in seconds
+        """
+        self.name = name
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.statuses = statuses
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    @classmethod
+    def register(cls, *args, **kwargs):
+        policy = cls(*args, **kwargs)
+        cls._policies[policy.name] = policy
+        return policy
+
+    @classmethod
+    def for_url(cls, url):
+        match = cls._ENDPOINT_RE.search(url)
+        if match:
+            name = match.group('endpoint') or match.group('feeds')
+            if name in cls._policies:
+                return cls._policies[name]
+        return cls._policies['default']
+
+    @classmethod
+    def _get_breakers(cls):
+        breakers = xbmcgui.Window(10000).getProperty(cls._PROPERTY_ID)
+        if not breakers:
+            return {}
+        try:
+            return json.loads(breakers)
+        except ValueError:
+            return {}
+
+    @classmethod
+    def _set_breakers(cls, breakers):
+        window = xbmcgui.Window(10000)
+        if breakers:
+            window.setProperty(cls._PROPERTY_ID, json.dumps(breakers))
+        else:
+            window.clearProperty(cls._PROPERTY_ID)
+
+    def check(self):
+        """
+        Raises CircuitBreakerOpen if requests to the endpoint are not allowed
+        """
+        if not self.failure_threshold:
+            return
+        open_until = self._get_breakers().get(self.name)
+        if open_until and open_until > time():
+            raise CircuitBreakerOpen(
+                'Circuit breaker open for |{name}| endpoint until |{time}|'
+                .format(name=self.name, time=open_until)
+            )
+
+    def open(self, seconds=None):
+        if seconds is None:
+            seconds = self.cooldown
+        log_error('RetryPolicy.open - |{name}| endpoint failing, '
+                  'requests paused for {seconds:.0f}s'
+                  .format(name=self.name, seconds=seconds))
+        with self._lock:
+            self._failures[self.name] = 0
+            breakers = self._get_breakers()
+            breakers[self.name] = time() + seconds
+            self._set_breakers(breakers)
+
+    def record(self, response=None):
+        """
+        Records the result of a request to the endpoint
+        :param response: requests.Response, None if no response was received
+        """
+        if not self.failure_threshold:
+            return
+
+        if response is None:
+            retry_after = None
+        elif response.status_code in self.statuses:
+            retry_after = self.get_retry_after(response)
+        else:
+            with self._lock:
+                if not self._failures.get(self.name):
+                    return
+                self._failures[self.name] = 0
+                breakers = self._get_breakers()
+                if breakers.pop(self.name, None):
+                    self._set_breakers(breakers)
+            return
+
+        if retry_after and retry_after > self.backoff_max:
+            self.open(max(retry_after, self.cooldown))
+            return
+
+        with self._lock:
+            failures = self._failures.get(self.name, 0) + 1
+            self._failures[self.name] = failures
+        if failures >= self.failure_threshold:
+            self.open()
+
+    @staticmethod
+    def get_retry_after(response):
+        """
+        :param response: requests.Response
+        :return: delay in seconds from a Retry-After header, or None
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        date = parsedate_tz(value)
+        if not date:
+            return None
+        return max(0, mktime_tz(date) - time())
+
+    def get_delay(self, attempt, response):
+        """
+        :param attempt: number of retries already made
+        :param response: requests.Response
+        :return: delay before retrying the request, in seconds, or None if
+                 the request should not be retried
+        """
+        if (attempt >= self.total
+                or response is None
+                or response.status_code not in self.statuses):
+            return None
+
+        retry_after = self.get_retry_after(response)
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                return None
+            delay = retry_after
+        else:
+            delay = min(self.backoff_max,
+                        self.backoff_factor * (2 ** attempt))
+            delay *= uniform(1 - self.jitter, 1 + self.jitter)
+
+        log_debug('RetryPolicy.get_delay - |{name}| endpoint status |{status}|'
+                  ', retry {attempt}/{total} in {delay:.2f}s'
+                  .format(name=self.name,
+                          status=response.status_code,
+                          attempt=(attempt + 1),
+                          total=self.total,
+                          delay=delay))
+        return delay
+
+
+RetryPolicy.register('default',
+                     statuses=frozenset((500, 502, 503, 504)))
+# Player and next requests are retried using other clients by the caller
+RetryPolicy.register('player',
+                     total=1,
+                     backoff_factor=0.5,
+                     failure_threshold=5)
+RetryPolicy.register('next',
+                     total=1,
+                     backoff_factor=0.5,
+                     failure_threshold=5)
+RetryPolicy.register('browse',
+                     total=2,
+                     failure_threshold=5)
+# Searches use 100 quota units per request
+RetryPolicy.register('search',
+                     total=1,
+                     backoff_factor=1,
+                     failure_threshold=3,
+                     cooldown=300)
+RetryPolicy.register('videos',
+                     total=2,
+                     failure_threshold=5)
+# Many feeds are requested at the same time for subscriptions
+RetryPolicy.register('feeds',
+                     total=1,
+                     failure_threshold=10,
+                     cooldown=300)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import errno
+import json
+import os
+import zipfile
+from base64 import b64decode, b64encode
+from contextlib import contextmanager
+from hashlib import sha1
+from threading import Lock
+from time import sleep, time
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from ..compatibility import parse_qsl, urlencode, urlsplit
+from ..logger import log_debug, log_error
+
+
+__all__ = (
+    'RecordReplayAdapter',
+    'get_transport_adapter',
+)
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """
+    Transport adapter that records responses to a fixture archive, or replays
+    recorded responses without making any network requests.
+
+    Enabled using environment variables:
+        YOUTUBE_TRANSPORT=record:<path to archive>
+        YOUTUBE_TRANSPORT=replay:<path to archive>
+        YOUTUBE_TRANSPORT_LATENCY=<seconds>|recorded
+
+    The archive is a zip file with one compressed JSON entry per request.
+    Requests are matched by method, url and body, ignoring secrets. Secrets
+    are not written to the archive. The archive is locked while a response is
+    written, so the plugin and the service can record to the same archive.
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    SECRET_PARAMS = frozenset((
+        'access_token',
+        'client_id',
+        'client_secret',
+        'code',
+        'device_code',
+        'id_token',
+        'key',
+        'refresh_token',
+    ))
+    # Only tokens are redacted from response bodies, as other parameter
+    # names, e.g. code and key, are also used for other data in responses
+    SECRET_RESPONSE_KEYS = frozenset((
+        'access_token',
+        'device_code',
+        'id_token',
+        'refresh_token',
+    ))
+    SKIP_HEADERS = frozenset((
+        'connection',
+        'content-encoding',
+        'content-length',
+        'keep-alive',
+        'set-cookie',
+        'transfer-encoding',
+    ))
+    REDACTED = '<redacted>'
+    # Time, in seconds, after which a lock file is assumed to be left over by
+    # a process that ended while recording
+    LOCK_TIMEOUT = 10
+
+    def __init__(self, mode, filepath, latency=None, **kwargs):
+        """
+        :param mode: RECORD or REPLAY
+        :param filepath: path of the fixture archive
+        :param latency: delay of replayed responses, in seconds, or
+                        'recorded' to use the recorded response time
+        """
+        super(RecordReplayAdapter, self).__init__(**kwargs)
+        self._mode = mode
+        self._filepath = filepath
+        self._latency = latency
+        self._lock = Lock()
+        self._recorded = set()
+        self._archive = None
+
+        if mode == self.REPLAY:
+            self._archive = zipfile.ZipFile(filepath, 'r')
+        elif os.path.isfile(filepath):
+            with zipfile.ZipFile(filepath, 'r') as archive:
+                self._recorded.update(archive.namelist())
+
+    def close(self):
+        if self._archive:
+            self._archive.close()
+            self._archive = None
+        super(RecordReplayAdapter, self).close()
+
+    def _redact(self, data, secrets):
+        if isinstance(data, dict):
+            return {
+                key: (self.REDACTED if key in secrets
+                      else self._redact(value, secrets))
+                for key, value in data.items()
+            }
+        if isinstance(data, list):
+            return [self._redact(value, secrets) for value in data]
+        return data
+
+    def _redact_body(self, body, content_type=None, secrets=None):
+        """
+        Redacts secrets from JSON bodies, by key, and from form encoded
+        bodies. Other bodies, and bodies without secrets, are not changed.
+        :return: body, decoded if it is UTF-8 encoded
+        """
+        if secrets is None:
+            secrets = self.SECRET_PARAMS
+        if not body:
+            return body
+        if isinstance(body, bytes):
+            try:
+                body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                return body
+        content_type = (content_type or '').lower()
+
+        if 'json' in content_type:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return body
+            redacted = self._redact(data, secrets)
+            if redacted != data:
+                return json.dumps(redacted, sort_keys=True)
+
+        elif 'application/x-www-form-urlencoded' in content_type:
+            params = parse_qsl(body, keep_blank_values=True)
+            if any(key in secrets for key, _ in params):
+                return urlencode(sorted(
+                    (key, self.REDACTED if key in secrets else value)
+                    for key, value in params
+                ))
+
+        return body
+
+    def _redact_url(self, url):
+        parts = urlsplit(url)
+        query = urlencode(sorted(
+            (key, self.REDACTED if key in self.SECRET_PARAMS else value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        ))
+        return parts._replace(query=query).geturl()
+
+    def _get_request_details(self, request):
+        url = self._redact_url(request.url)
+        body = self._redact_body(request.body,
+                                 request.headers.get('Content-Type'))
+        if isinstance(body, bytes):
+            body = b64encode(body).decode('ascii')
+        key = sha1('\n'.join((
+            request.method, url, body or ''
+        )).encode('utf-8')).hexdigest()
+        return key + '.json', {
+            'method': request.method,
+            'url': url,
+            'body': body,
+        }
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        name, request_details = self._get_request_details(request)
+
+        if self._mode == self.REPLAY:
+            return self._replay(request, name)
+
+        start_time = time()
+        response = super(RecordReplayAdapter, self).send(request,
+                                                         stream=stream,
+                                                         timeout=timeout,
+                                                         verify=verify,
+                                                         cert=cert,
+                                                         proxies=proxies)
+        content = response.content
+        elapsed = time() - start_time
+
+        headers = {
+            header: value
+            for header, value in response.headers.items()
+            if header.lower() not in self.SKIP_HEADERS
+        }
+        body = self._redact_body(content,
+                                 headers.get('Content-Type'),
+                                 self.SECRET_RESPONSE_KEYS)
+        if isinstance(body, bytes):
+            body = {'base64': b64encode(body).decode('ascii')}
+        fixture = {
+            'request': request_details,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': headers,
+            'body': body,
+            'elapsed': elapsed,
+        }
+
+        with self._lock:
+            if name not in self._recorded:
+                with self._file_lock():
+                    with zipfile.ZipFile(self._filepath,
+                                         'a',
+                                         zipfile.ZIP_DEFLATED) as archive:
+                        # May have been recorded by another process
+                        if name not in archive.namelist():
+                            archive.writestr(name, json.dumps(fixture))
+                self._recorded.add(name)
+        return response
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Lock of the archive shared between processes, using a lock file that
+        is created atomically
+        """
+        lock_path = self._filepath + '.lock'
+        while 1:
+            try:
+                os.close(os.open(lock_path,
+                                 os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except OSError as exc:
+                if exc.errno not in (errno.EEXIST, errno.EACCES):
+                    raise
+            try:
+                if time() - os.path.getmtime(lock_path) > self.LOCK_TIMEOUT:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            sleep(0.01)
+        try:
+            yield
+        finally:
+            os.remove(lock_path)
+
+    def _replay(self, request, name):
+        try:
+            with self._lock:
+                # The shared session, and so this adapter, is closed whenever
+                # a BaseRequestsClass instance is deleted
+                if self._archive is None:
+                    self._archive = zipfile.ZipFile(self._filepath, 'r')
+                fixture = json.loads(self._archive.read(name).decode('utf-8'))
+        except KeyError:
+            log_error('RecordReplayAdapter - No recorded response for:\n'
+                      '{method} {url}'.format(method=request.method,
+                                              url=self._redact_url(request.url)))
+            raise RequestsConnectionError('No recorded response',
+                                          request=request)
+
+        latency = self._latency
+        if latency == 'recorded':
+            latency = fixture.get('elapsed')
+        if latency:
+            sleep(latency)
+
+        body = fixture['body']
+        if isinstance(body, dict):
+            content = b64decode(body['base64'])
+        elif body is None:
+            content = b''
+        else:
+            content = body.encode('utf-8')
+
+        response = Response()
+        response.status_code = fixture['status']
+        response.reason = fixture.get('reason')
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        log_debug('RecordReplayAdapter - Replayed: {method} {url}'
+                  .format(method=request.method,
+                          url=self._redact_url(request.url)))
+        return response
+
+
+def get_transport_adapter(**kwargs):
+    """
+    :return: RecordReplayAdapter if enabled by the YOUTUBE_TRANSPORT
+             environment variable, otherwise None
+    """
+    transport = os.environ.get('YOUTUBE_TRANSPORT')
+    if not transport:
+        return None
+
+    mode, _, filepath = transport.partition(':')
+    if mode not in (RecordReplayAdapter.RECORD, RecordReplayAdapter.REPLAY):
+        log_error('get_transport_adapter - Invalid mode: |{mode}|'
+                  .format(mode=mode))
+        return None
+
+    latency = os.environ.get('YOUTUBE_TRANSPORT_LATENCY')
+    if latency and latency != 'recorded':
+        try:
+            latency = float(latency)
+        except ValueError:
+            latency = None
+
+    return RecordReplayAdapter(mode, filepath, latency=latency, **kwargs)
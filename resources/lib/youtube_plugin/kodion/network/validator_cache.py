@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+from hashlib import md5
+from threading import Lock
+
+from ..logger import log_debug
+
+
+__all__ = (
+    'ValidatorCache',
+)
+
+
+class ValidatorCache(object):
+    """
+    Cache of response validators (ETag and Last-Modified headers) and response
+    bodies, used to make conditional requests.
+
+    If a validator is stored for a request then If-None-Match and/or
+    If-Modified-Since headers are added to the request, and a 304 Not Modified
+    response is replaced by the stored response body.
+    """
+
+    METHODS = frozenset(('GET', 'HEAD'))
+    # Larger response bodies are not stored, as they would take the place of
+    # many other items in the data cache
+    MAX_BODY_SIZE = 128 * 1024
+
+    _counters = {
+        'hits': 0,
+        'not_modified': 0,
+        'misses': 0,
+    }
+    _lock = Lock()
+
+    def __init__(self, data_cache, seconds=None, max_body_size=MAX_BODY_SIZE):
+        """
+        :param data_cache: DataCache used to store validators and bodies
+        :param seconds: maximum age of stored validators, defaults to one day
+        :param max_body_size: maximum size of stored response bodies, in bytes
+        """
+        self._cache = data_cache
+        self._seconds = data_cache.ONE_DAY if seconds is None else seconds
+        self._max_body_size = max_body_size
+
+    @staticmethod
+    def create_key(method, url, params=None):
+        md5_hash = md5()
+        md5_hash.update(method.upper().encode('utf-8'))
+        md5_hash.update(url.encode('utf-8'))
+        if params:
+            md5_hash.update(str(sorted(
+                (str(key), str(value))
+                for key, value in params.items()
+                if value is not None
+            )).encode('utf-8'))
+        return 'validators.' + md5_hash.hexdigest()
+
+    @classmethod
+    def _count(cls, counter):
+        with cls._lock:
+            cls._counters[counter] += 1
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return dict(cls._counters)
+
+    def prepare(self, method, url, params=None, headers=None):
+        """
+        Adds conditional request headers for a stored validator, if any
+        :param method: HTTP method of the request
+        :param url: url of the request
+        :param params: query parameters of the request
+        :param headers: headers of the request
+        :return: tuple of (cache key, stored entry or None, request headers)
+        """
+        if method.upper() not in self.METHODS:
+            return None, None, headers
+
+        key = self.create_key(method, url, params)
+        entry = self._cache.get_item(key, self._seconds)
+        if not entry:
+            self._count('misses')
+            return key, None, headers
+
+        self._count('hits')
+        headers = dict(headers) if headers else {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return key, entry, headers
+
+    def update(self, key, entry, response):
+        """
+        Stores validators of a response, or restores the stored body of a 304
+        Not Modified response
+        :param key: cache key returned by prepare
+        :param entry: stored entry returned by prepare
+        :param response: requests.Response
+        :return: requests.Response
+        """
+        if not key or response is None:
+            return response
+
+        status_code = response.status_code
+        if status_code == 304:
+            if not entry:
+                return response
+            self._count('not_modified')
+            response._content = entry['body'].encode('utf-8')
+            response.encoding = 'utf-8'
+            response.status_code = 200
+            log_debug('ValidatorCache.update - Not modified: |{url}|\n'
+                      'Stats: {stats}'.format(url=response.url,
+                                              stats=self.stats()))
+            return response
+
+        if status_code != 200:
+            return response
+
+        headers = response.headers
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if (etag or last_modified) and (
+                len(response.content) <= self._max_body_size):
+            self._cache.set_item(key, {
+                'etag': etag,
+                'last_modified': last_modified,
+                'body': response.text,
+            }, self._seconds)
+        elif entry:
+            self._cache.remove(key)
+        return response
@@ -128,21 +128,22 @@ def _maintenance_actions(context, action, params):
     ui = context.get_ui()
     localize = context.localize
 
+    storages = {
+        'data_cache': context.get_data_cache,
+        'function_cache': context.get_function_cache,
+        'playback_history': context.get_playback_history,
+        'search_history': context.get_search_history,
+        'watch_later': context.get_watch_later_list,
+    }
+
     if action == 'clear':
-        targets = {
-            'data_cache': context.get_data_cache,
-            'function_cache': context.get_function_cache,
-            'playback_history': context.get_playback_history,
-            'search_history': context.get_search_history,
-            'watch_later': context.get_watch_later_list,
-        }
-        if target not in targets:
+        if target not in storages:
             return
 
         if ui.on_remove_content(
             localize('maintenance.{0}'.format(target))
         ):
-            targets[target]().clear()
+            storages[target]().clear()
             ui.show_notification(localize('succeeded'))
 
     elif action == 'delete':
@@ -164,6 +165,19 @@ def _maintenance_actions(context, action, params):
         if not path:
             return
 
+        # Storages in a consolidated database are tables, rather than files,
+        # so are removed from the database instead
+        if (target in storages
+                and context.get_settings().use_consolidated_storage()):
+            if ui.on_delete_content(
+                localize('maintenance.{0}'.format(target))
+            ):
+                succeeded = storages[target]().drop()
+                ui.show_notification(
+                    localize('succeeded' if succeeded else 'failed')
+                )
+            return
+
         if target == 'temp_dir':
             target = path[0]
         elif target == 'other_dir':
@@ -25,7 +25,7 @@ def run():
     context.log_debug('YouTube service initialization...')
     context.get_ui().clear_property('abort_requested')
 
-    monitor = ServiceMonitor()
+    monitor = ServiceMonitor(context=context)
     player = PlayerMonitor(provider=Provider(),
                            context=context,
                            monitor=monitor)
@@ -35,8 +35,20 @@ def run():
 
     wait_interval = 10
     ping_period = waited = 60
+    sweep_period = 600
+    swept = 0
     restart_attempts = 0
     while not monitor.abortRequested():
+        if swept >= sweep_period:
+            swept = 0
+
+            # remove expired cache entries in small batches, and release the
+            # databases until the next sweep
+            for cache in (context.get_data_cache(),
+                          context.get_function_cache()):
+                cache.remove_expired()
+            context.tear_down()
+
         if waited >= ping_period:
             waited = 0
 
@@ -53,6 +65,7 @@ def run():
         if monitor.waitForAbort(wait_interval):
             break
         waited += wait_interval
+        swept += wait_interval
 
     context.get_ui().set_property('abort_requested', 'true')
 
@@ -61,3 +74,5 @@ def run():
 
     if monitor.httpd:
         monitor.shutdown_httpd()  # shutdown http server
+
+    context.tear_down()
@@ -68,6 +68,9 @@ class AbstractSettings(object):
             return self.set_int(settings.ITEMS_PER_PAGE, value)
         return self.get_int(settings.ITEMS_PER_PAGE, 50)
 
+    def subscriptions_per_channel(self):
+        return self.get_int(settings.SUBSCRIPTIONS_PER_CHANNEL, 15)
+
     _VIDEO_QUALITY_MAP = {
         0: 240,
         1: 360,
@@ -99,6 +102,9 @@ class AbstractSettings(object):
     def get_search_history_size(self):
         return self.get_int(settings.SEARCH_SIZE, 10)
 
+    def use_consolidated_storage(self):
+        return self.get_bool(settings.CONSOLIDATED_STORAGE, False)
+
     def is_setup_wizard_enabled(self):
         # Increment min_required on new release to enable oneshot on first run
         min_required = 2
@@ -246,6 +252,9 @@ class AbstractSettings(object):
             allow_list.append('.'.join(map(str, octets)))
         return allow_list
 
+    def httpd_gateway(self):
+        return self.get_bool(settings.HTTPD_GATEWAY, False)
+
     def api_config_page(self):
         return self.get_bool(settings.API_CONFIG_PAGE, False)
 
@@ -14,15 +14,22 @@ from .storage import Storage
 
 
 class DataCache(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath, max_file_size_mb=5):
+    _buffer_size = 100
+    _buffer_time = 30
+
+    _memory_size = 500
+    _memory_bytes = 4 * 1024 * 1024
+
+    def __init__(self, filepath, max_file_size_mb=5, table_name=None):
         max_file_size_kb = max_file_size_mb * 1024
         super(DataCache, self).__init__(filepath,
-                                        max_file_size_kb=max_file_size_kb)
+                                        max_file_size_kb=max_file_size_kb,
+                                        table_name=table_name)
 
     def get_items(self, content_ids, seconds):
         result = self._get_by_ids(content_ids, seconds=seconds, as_dict=True)
@@ -32,11 +39,11 @@ class DataCache(Storage):
         result = self._get(content_id, seconds=seconds)
         return result
 
-    def set_item(self, content_id, item):
-        self._set(content_id, item)
+    def set_item(self, content_id, item, seconds=None):
+        self._set(content_id, item, seconds=seconds)
 
-    def set_items(self, items):
-        self._set_many(items)
+    def set_items(self, items, seconds=None):
+        self._set_many(items, seconds=seconds)
 
     def remove(self, content_id):
         self._remove(content_id)
@@ -15,20 +15,20 @@ from ..items import from_json
 
 
 class FavoriteList(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath):
-        super(FavoriteList, self).__init__(filepath)
+    def __init__(self, filepath, table_name=None):
+        super(FavoriteList, self).__init__(filepath, table_name=table_name)
 
     @staticmethod
     def _sort_item(item):
         return item.get_name().upper()
 
     def get_items(self):
-        result = self._get_by_ids(process=from_json, values_only=True)
+        result = (item for _, _, item in self._iter_items(process=from_json))
         return sorted(result, key=self._sort_item, reverse=False)
 
     def add(self, item_id, item):
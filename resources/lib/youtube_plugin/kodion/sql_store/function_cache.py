@@ -12,20 +12,38 @@ from __future__ import absolute_import, division, unicode_literals
 
 from functools import partial
 from hashlib import md5
+from threading import Lock, Thread
+from time import time
+from traceback import format_stack
 
-from .storage import Storage
+from .storage import Storage, since_epoch
+from ..logger import log_debug, log_error
 
 
 class FunctionCache(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath, max_file_size_mb=5):
+    _buffer_size = 100
+    _buffer_time = 30
+
+    _memory_size = 100
+    _memory_bytes = 4 * 1024 * 1024
+
+    # Background refreshes of stale results, at most one per cache id
+    # {cache_id: Thread}
+    _refreshing = {}
+    _refreshing_lock = Lock()
+    # Maximum time, in seconds, to wait for background refreshes on close
+    REFRESH_TIMEOUT = 2
+
+    def __init__(self, filepath, max_file_size_mb=5, table_name=None):
         max_file_size_kb = max_file_size_mb * 1024
         super(FunctionCache, self).__init__(filepath,
-                                            max_file_size_kb=max_file_size_kb)
+                                            max_file_size_kb=max_file_size_kb,
+                                            table_name=table_name)
 
         self._enabled = True
 
@@ -74,9 +92,17 @@ class FunctionCache(Storage):
         :param func, function to cache
         :param seconds: time to live in
         :param _refresh: bool, updates cache with new func result
+        :param _stale_ttl: int, time in seconds after expiry that a stale
+                           result is still returned, while the cache is
+                           updated with a new func result in the background
+        :param _max_ttl: int, time in seconds that a new func result is
+                         stored for, if longer than seconds, so that it can
+                         be used by later calls with a longer time to live
         :return:
         """
         refresh = kwargs.pop('_refresh', False)
+        stale_ttl = kwargs.pop('_stale_ttl', 0)
+        max_ttl = kwargs.pop('_max_ttl', 0)
         partial_func = partial(func, *args, **kwargs)
 
         # if caching is disabled call the function
@@ -84,13 +110,84 @@ class FunctionCache(Storage):
             return partial_func()
 
         cache_id = self._create_id_from_func(partial_func)
-        data = None if refresh else self._get(cache_id, seconds=seconds)
-        if data is None:
+        if not stale_ttl:
+            data = None if refresh else self._get(cache_id, seconds=seconds)
+            if data is None:
+                data = partial_func()
+                self._set(cache_id, data, seconds=max(seconds, max_ttl))
+            return data
+
+        # Stale results are kept until they are too old to be used
+        max_age = seconds + stale_ttl
+        cached = None if refresh else self._get(cache_id,
+                                                process=self._with_timestamp,
+                                                seconds=max_age)
+        max_age = max(max_age, max_ttl)
+        if cached is None or cached[0] is None:
             data = partial_func()
-            self._set(cache_id, data)
+            self._set(cache_id, data, seconds=max_age)
+            return data
 
+        data, timestamp = cached
+        if timestamp < since_epoch() - seconds:
+            self._refresh(cache_id, partial_func, max_age)
         return data
 
+    @staticmethod
+    def _with_timestamp(value, item):
+        return value, item[1]
+
+    def _refresh(self, cache_id, partial_func, seconds):
+        with self._refreshing_lock:
+            thread = self._refreshing.get(cache_id)
+            if thread and thread.is_alive():
+                return
+            thread = Thread(target=self._threaded_refresh,
+                            args=(cache_id, partial_func, seconds))
+            thread.daemon = True
+            self._refreshing[cache_id] = thread
+        thread.start()
+
+    def _threaded_refresh(self, cache_id, partial_func, seconds):
+        try:
+            data = partial_func()
+            if data is not None:
+                self._set(cache_id, data, seconds=seconds)
+        except Exception as exc:
+            log_error('FunctionCache._threaded_refresh - {exc}:\n{details}'
+                      .format(exc=exc, details=''.join(format_stack())))
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.pop(cache_id, None)
+
+    def wait_for_refresh(self, timeout=None):
+        """
+        Waits for background refreshes of stale results to complete
+        :param timeout: maximum time in seconds to wait for all refreshes
+        :return: True if all refreshes completed, False otherwise
+        """
+        with self._refreshing_lock:
+            threads = list(self._refreshing.values())
+        end_time = None if timeout is None else time() + timeout
+        for thread in threads:
+            if end_time is None:
+                thread.join()
+                continue
+            remaining = end_time - time()
+            if remaining <= 0:
+                break
+            thread.join(remaining)
+        return not any(thread.is_alive() for thread in threads)
+
+    def close(self):
+        # Refreshes still running are abandoned, rather than delaying
+        # teardown for the duration of a slow request
+        if not self.wait_for_refresh(self.REFRESH_TIMEOUT):
+            log_debug('FunctionCache.close - Background refresh not completed'
+                      ' within {timeout}s',
+                      timeout=self.REFRESH_TIMEOUT)
+        super(FunctionCache, self).close()
+
     def _optimize_item_count(self, limit=-1, defer=False):
         # override method Storage._optimize_item_count
         # for function cache do not optimize by item count, use database size.
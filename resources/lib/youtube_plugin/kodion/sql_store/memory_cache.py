@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+from collections import OrderedDict
+from threading import Lock
+
+from ..compatibility import byte_string_type, string_type
+
+
+class MemoryCache(object):
+    """
+    Least recently used cache of stored rows, bounded by number of entries and
+    approximate size in bytes.
+
+    Rows are kept as they were read from, or written to, the database. Values
+    of immutable types are also kept decoded, as they can be shared between
+    callers. Values of other types are decoded again on every hit, so callers
+    are free to modify the returned value.
+    """
+
+    IMMUTABLE_TYPES = (string_type, byte_string_type, int, float, bool)
+
+    def __init__(self, max_items, max_bytes):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """
+        :param key: row key
+        :return: tuple of (row, decoded value or None), or None if not cached
+        """
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Move to the most recently used position
+            del self._items[key]
+            self._items[key] = entry
+            self.hits += 1
+        return entry
+
+    def set(self, key, row, value=None):
+        if not isinstance(value, self.IMMUTABLE_TYPES):
+            value = None
+        size = row[3] or 0
+        if size > self._max_bytes:
+            self.pop(key)
+            return
+
+        with self._lock:
+            old_entry = self._items.pop(key, None)
+            if old_entry:
+                self._bytes -= old_entry[0][3] or 0
+            self._items[key] = (row, value)
+            self._bytes += size
+
+            while (len(self._items) > self._max_items
+                   or self._bytes > self._max_bytes):
+                _, (old_row, _) = self._items.popitem(last=False)
+                self._bytes -= old_row[3] or 0
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._items.pop(key, None)
+            if entry:
+                self._bytes -= entry[0][3] or 0
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'items': len(self._items),
+            'bytes': self._bytes,
+        }
@@ -13,13 +13,15 @@ from .storage import Storage, fromtimestamp
 
 
 class PlaybackHistory(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath, migrate=False):
-        super(PlaybackHistory, self).__init__(filepath, migrate=migrate)
+    def __init__(self, filepath, migrate=False, table_name=None):
+        super(PlaybackHistory, self).__init__(filepath,
+                                              migrate=migrate,
+                                              table_name=table_name)
 
     @staticmethod
     def _add_last_played(value, item):
@@ -36,6 +38,15 @@ class PlaybackHistory(Storage):
                                   limit=limit)
         return result
 
+    def get_page(self, page_token=None, limit=50, process=None):
+        if process is None:
+            process = self._add_last_played
+        result, next_page_token = self._get_page(page_token,
+                                                 limit=limit,
+                                                 oldest_first=False,
+                                                 process=process)
+        return dict(result), next_page_token
+
     def get_item(self, key):
         result = self._get(key, process=self._add_last_played)
         return result
@@ -16,15 +16,20 @@ from .storage import Storage
 
 
 class SearchHistory(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath, max_item_count=10, migrate=False):
+    def __init__(self,
+                 filepath,
+                 max_item_count=10,
+                 migrate=False,
+                 table_name=None):
         super(SearchHistory, self).__init__(filepath,
                                             max_item_count=max_item_count,
-                                            migrate=migrate)
+                                            migrate=migrate,
+                                            table_name=table_name)
 
     def get_items(self, process=None):
         result = self._get_by_ids(oldest_first=False,
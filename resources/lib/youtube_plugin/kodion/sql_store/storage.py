@@ -10,15 +10,37 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+import atexit
+import json
+import marshal
 import os
 import pickle
 import sqlite3
 import time
+import zlib
+from itertools import islice
+from threading import Lock, RLock
 from traceback import format_stack
 
-from ..logger import log_error
+from ..compatibility import byte_string_type
+from ..logger import log_debug, log_error
 from ..utils.datetime_parser import fromtimestamp, since_epoch
 from ..utils.methods import make_dirs
+from .memory_cache import MemoryCache
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+class _TableState(object):
+    def __init__(self):
+        self._sql = {}
+        self._table_created = False
+        # Other tables in the database belong to other storages, and are not
+        # removed as old tables
+        self._table_updated = True
 
 
 class Storage(object):
@@ -28,8 +50,82 @@ class Storage(object):
     ONE_WEEK = 7 * ONE_DAY
     ONE_MONTH = 4 * ONE_WEEK
 
+    # Connections are shared by all instances using the same database file and
+    # are kept open for the lifetime of the process, or until close() is called
+    # {filepath: [db, cursor]}
+    _connections = {}
+    # {filepath: RLock}
+    _locks = {}
+    _locks_lock = Lock()
+    # State of tables with a name other than the default table name of the
+    # storage class, used when several storages share a single database file
+    # {(filepath, table): _TableState}
+    _tables = {}
+    # Pending writes, shared by all instances using the same table
+    # {(filepath, table): {'since': timestamp,
+    #                      'items': {key: values},
+    #                      'storage': Storage}}
+    _buffers = {}
+
+    # Values are stored with a single header byte, followed by the serialised
+    # and optionally compressed value. The low nibble of the header identifies
+    # the serialiser, the high nibble the compression method. Header values are
+    # all lower than any pickle opcode, so rows written before the header was
+    # introduced are still read as plain pickles.
+    _SERIALISERS = {
+        'pickle': 0x01,
+        'marshal': 0x02,
+        'json': 0x03,
+    }
+    _COMPRESSORS = {
+        None: 0x00,
+        'zlib': 0x10,
+        'lzma': 0x20,
+    }
+    _HEADERS = frozenset((
+        0x01, 0x02, 0x03,
+        0x11, 0x12, 0x13,
+        0x21, 0x22, 0x23,
+    ))
+
+    _codec = 'pickle'
+    _compression = 'zlib'
+    # Minimum size, in bytes, of a serialised value before it is compressed
+    _compression_threshold = 4096
+
+    # Write-behind buffering of set/remove operations. Pending writes are kept
+    # in memory, used to serve reads, and written in a single transaction once
+    # _buffer_size writes are pending, the oldest pending write is older than
+    # _buffer_time seconds, or when the storage is flushed or closed.
+    # Set _buffer_size to 0 to write immediately.
+    _buffer_size = 0
+    _buffer_time = 0
+
+    # In memory cache of recently used rows, per instance. Reads are served
+    # from memory when possible, and writes are made to both memory and the
+    # database. Limited to _memory_size rows and _memory_bytes bytes of stored
+    # values. Set _memory_size to 0 to disable.
+    _memory_size = 0
+    _memory_bytes = 0
+
+    # Number of keys bound by each of the statements used to get or remove
+    # many items by key. Keys are split into chunks of the largest size, and
+    # the last chunk is padded to the nearest size, so only these statements
+    # are prepared, and the number of bound variables remains below the limit
+    # of 999 used by older SQLite builds.
+    _chunk_sizes = (10, 50, 250)
+
+    # Maximum number of expired rows removed in a single transaction
+    _expired_batch_size = 100
+
+    # Maximum number of free pages reclaimed after removing rows. Any remaining
+    # free pages are reused by later writes, or reclaimed by later removals.
+    _vacuum_pages = 256
+
     _base = None
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
+    # Table used by the previous schema version, upgraded in place when found
+    _previous_table_name = 'storage_v2'
     _table_created = False
     _table_updated = False
 
@@ -44,51 +140,176 @@ class Storage(object):
             '  key TEXT PRIMARY KEY,'
             '  timestamp REAL,'
             '  value BLOB,'
-            '  size INTEGER'
+            '  size INTEGER,'
+            '  expires_at REAL'
+            ' );'
+        ),
+        # Index on (timestamp, key), rather than timestamp alone, so pages of
+        # items ordered by timestamp and key can be read from the index
+        'create_index': (
+            'DROP INDEX'
+            ' IF EXISTS {table}_timestamp;'
+            'CREATE INDEX'
+            ' IF NOT EXISTS {table}_timestamp_key'
+            ' ON {table} (timestamp, key);'
+            'CREATE INDEX'
+            ' IF NOT EXISTS {table}_expires_at'
+            ' ON {table} (expires_at)'
+            ' WHERE expires_at IS NOT NULL;'
+        ),
+        # Running total of the size of all stored values, maintained by
+        # triggers, to avoid summing the size of every row when pruning
+        'create_size_ledger': (
+            'CREATE TABLE'
+            ' IF NOT EXISTS {table}_size ('
+            '  id INTEGER PRIMARY KEY CHECK (id = 0),'
+            '  total INTEGER NOT NULL'
             ' );'
+            'INSERT OR IGNORE'
+            ' INTO {table}_size'
+            ' (id, total)'
+            ' SELECT 0, IFNULL(SUM(size), 0)'
+            ' FROM {table};'
+            'CREATE TRIGGER'
+            ' IF NOT EXISTS {table}_size_insert'
+            ' AFTER INSERT ON {table}'
+            ' BEGIN'
+            '  UPDATE {table}_size'
+            '  SET total = total + IFNULL(NEW.size, 0)'
+            '  WHERE id = 0;'
+            ' END;'
+            'CREATE TRIGGER'
+            ' IF NOT EXISTS {table}_size_delete'
+            ' AFTER DELETE ON {table}'
+            ' BEGIN'
+            '  UPDATE {table}_size'
+            '  SET total = total - IFNULL(OLD.size, 0)'
+            '  WHERE id = 0;'
+            ' END;'
+            'CREATE TRIGGER'
+            ' IF NOT EXISTS {table}_size_update'
+            ' AFTER UPDATE OF size ON {table}'
+            ' BEGIN'
+            '  UPDATE {table}_size'
+            '  SET total = total + IFNULL(NEW.size, 0) - IFNULL(OLD.size, 0)'
+            '  WHERE id = 0;'
+            ' END;'
+        ),
+        'drop_table': (
+            'DROP TABLE IF EXISTS {table};'
+            'DROP TABLE IF EXISTS {table}_size;'
         ),
         'drop_old_table': (
             'DELETE'
             ' FROM sqlite_master'
-            ' WHERE type = "table"'
-            ' and name IS NOT "{table}";'
+            ' WHERE tbl_name NOT IN ("{table}", "{table}_size")'
+            ' and tbl_name NOT LIKE "sqlite_%";'
         ),
         'get': (
             'SELECT *'
             ' FROM {table}'
-            ' WHERE key = ?;'
+            ' WHERE key = ?'
+            ' AND {unexpired};'
         ),
         'get_by_key': (
             'SELECT *'
             ' FROM {table}'
-            ' WHERE key in ({{0}});'
+            ' WHERE key in ({{0}})'
+            ' AND {unexpired};'
         ),
         'get_many': (
             'SELECT *'
             ' FROM {table}'
+            ' WHERE {unexpired}'
             ' ORDER BY {order_col}'
             ' LIMIT {{0}};'
         ),
         'get_many_desc': (
             'SELECT *'
             ' FROM {table}'
+            ' WHERE {unexpired}'
             ' ORDER BY {order_col} DESC'
             ' LIMIT {{0}};'
         ),
+        'get_page': (
+            'SELECT *'
+            ' FROM {table}'
+            ' WHERE timestamp >= ?'
+            ' AND (timestamp > ? OR key > ?)'
+            ' AND {unexpired}'
+            ' ORDER BY timestamp, key'
+            ' LIMIT {{0}};'
+        ),
+        'get_page_desc': (
+            'SELECT *'
+            ' FROM {table}'
+            ' WHERE timestamp <= ?'
+            ' AND (timestamp < ? OR key < ?)'
+            ' AND {unexpired}'
+            ' ORDER BY timestamp DESC, key DESC'
+            ' LIMIT {{0}};'
+        ),
+        'get_oldest': (
+            'SELECT timestamp, size'
+            ' FROM {table}'
+            ' ORDER BY timestamp;'
+        ),
+        'get_total_size': (
+            'SELECT total'
+            ' FROM {table}_size'
+            ' WHERE id = 0;'
+        ),
         'has_old_table': (
             'SELECT EXISTS ('
             ' SELECT 1'
             ' FROM sqlite_master'
             ' WHERE type = "table"'
-            ' and name IS NOT "{table}"'
+            ' and name NOT IN ("{table}", "{table}_size")'
+            ' and name NOT LIKE "sqlite_%"'
+            ');'
+        ),
+        'has_previous_table': (
+            'SELECT EXISTS ('
+            ' SELECT 1'
+            ' FROM sqlite_master'
+            ' WHERE type = "table"'
+            ' and name = "{previous_table}"'
+            ') AND NOT EXISTS ('
+            ' SELECT 1'
+            ' FROM sqlite_master'
+            ' WHERE type = "table"'
+            ' and name = "{table}"'
             ');'
         ),
+        # Rows are only replaced by newer rows of the source table
+        'import_table': (
+            'REPLACE'
+            ' INTO main.{table}'
+            ' (key, timestamp, value, size, expires_at)'
+            ' SELECT s.key, s.timestamp, s.value, s.size, s.expires_at'
+            ' FROM source.{{0}} AS s'
+            ' LEFT JOIN main.{table} AS t'
+            ' ON t.key = s.key'
+            ' WHERE t.key IS NULL'
+            ' OR IFNULL(s.timestamp, 0) > IFNULL(t.timestamp, 0);'
+        ),
         'is_empty': (
             'SELECT EXISTS ('
             ' SELECT 1'
             ' FROM {table}'
             ');'
         ),
+        # Upgrade the previous table in place. The size ledger and indexes of
+        # the previous table are dropped and then recreated for the new table.
+        'migrate_table': (
+            'DROP TRIGGER IF EXISTS {previous_table}_size_insert;'
+            'DROP TRIGGER IF EXISTS {previous_table}_size_delete;'
+            'DROP TRIGGER IF EXISTS {previous_table}_size_update;'
+            'DROP TABLE IF EXISTS {previous_table}_size;'
+            'DROP INDEX IF EXISTS {previous_table}_timestamp;'
+            'ALTER TABLE {previous_table} RENAME TO {table};'
+            'ALTER TABLE {table} ADD COLUMN expires_at REAL;'
+        ),
         'prune_by_count': (
             'DELETE'
             ' FROM {table}'
@@ -100,19 +321,21 @@ class Storage(object):
             '  OFFSET {{1}}'
             ' );'
         ),
-        'prune_by_size': (
+        'prune_expired': (
             'DELETE'
             ' FROM {table}'
             ' WHERE rowid IN ('
             '  SELECT rowid'
             '  FROM {table}'
-            '  WHERE ('
-            '   SELECT SUM(size)'
-            '   FROM {table} AS _'
-            '   WHERE timestamp<={table}.timestamp'
-            '  ) <= {{0}}'
+            '  WHERE expires_at <= ?'
+            '  LIMIT {{0}}'
             ' );'
         ),
+        'prune_by_size': (
+            'DELETE'
+            ' FROM {table}'
+            ' WHERE timestamp <= {{0!r}};'
+        ),
         'remove': (
             'DELETE'
             ' FROM {table}'
@@ -126,13 +349,13 @@ class Storage(object):
         'set': (
             'REPLACE'
             ' INTO {table}'
-            ' (key, timestamp, value, size)'
-            ' VALUES (?,?,?,?);'
+            ' (key, timestamp, value, size, expires_at)'
+            ' VALUES (?,?,?,?,?);'
         ),
         'set_flat': (
             'REPLACE'
             ' INTO {table}'
-            ' (key, timestamp, value, size)'
+            ' (key, timestamp, value, size, expires_at)'
             ' VALUES {{0}};'
         ),
     }
@@ -141,12 +364,17 @@ class Storage(object):
                  filepath,
                  max_item_count=-1,
                  max_file_size_kb=-1,
-                 migrate=False):
+                 migrate=False,
+                 table_name=None):
         self._filepath = filepath
-        self._db = None
-        self._cursor = None
+        with Storage._locks_lock:
+            self._lock = Storage._locks.setdefault(filepath, RLock())
+            if table_name and not migrate:
+                self._base = Storage._tables.setdefault((filepath, table_name),
+                                                        _TableState())
         self._max_item_count = -1 if migrate else max_item_count
         self._max_file_size_kb = -1 if migrate else max_file_size_kb
+        self._filter_expired = not migrate
 
         if migrate:
             self._base = self
@@ -154,39 +382,144 @@ class Storage(object):
             self._table_name = migrate
             self._table_created = True
             self._table_updated = True
+        elif table_name:
+            self._sql = self._base._sql
+            self._table_name = table_name
         else:
             self._base = self.__class__
 
+        # Tables being migrated predate the timestamp and expires_at columns
         if migrate or not self._sql:
             statements = {
-                name: sql.format(table=self._table_name,
-                                 order_col='time' if migrate else 'timestamp')
+                name: sql.format(
+                    table=self._table_name,
+                    previous_table=self._previous_table_name,
+                    order_col='time' if migrate else 'timestamp',
+                    unexpired='1' if migrate else (
+                        'timestamp >= ?'
+                        ' AND (expires_at IS NULL OR expires_at > ?)'
+                    ),
+                )
                 for name, sql in Storage._sql.items()
             }
             self._base._sql.update(statements)
 
+        if self._buffer_size:
+            with Storage._locks_lock:
+                self._buffer = Storage._buffers.setdefault(
+                    (filepath, self._table_name),
+                    {'since': 0, 'items': {}, 'storage': self},
+                )
+        else:
+            self._buffer = None
+
+        if self._memory_size:
+            self._memory = MemoryCache(self._memory_size, self._memory_bytes)
+        else:
+            self._memory = None
+
     def set_max_item_count(self, max_item_count):
         self._max_item_count = max_item_count
 
     def set_max_file_size_kb(self, max_file_size_kb):
         self._max_file_size_kb = max_file_size_kb
 
-    def __del__(self):
-        self._close()
-
     def __enter__(self):
-        if not self._db or not self._cursor:
-            self._open()
-        return self._db, self._cursor
+        self._lock.acquire()
+        try:
+            connection = self._connections.get(self._filepath)
+            if connection and os.path.exists(self._filepath):
+                if not self._base._table_created:
+                    self._prepare(connection[1])
+                return connection
+            return self._open()
+        except:
+            self._lock.release()
+            raise
 
     def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
-        self._close()
+        self._lock.release()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._close(self._filepath)
+        if self._memory is not None:
+            log_debug('SQLStorage.close - {name} memory cache: {stats}'.format(
+                name=self.__class__.__name__, stats=self._memory.stats()
+            ))
+
+    @classmethod
+    def close_all(cls):
+        for buffer in list(cls._buffers.values()):
+            buffer['storage'].flush()
+        for filepath, lock in list(cls._locks.items()):
+            with lock:
+                cls._close(filepath)
+
+    def flush(self):
+        buffer = self._buffer
+        if not buffer or not buffer['items']:
+            return False
+
+        with self._lock:
+            items = buffer['items']
+            removed = []
+            updated = []
+            for key, values in items.items():
+                if values is None:
+                    removed.append((key,))
+                else:
+                    updated.append(values)
+
+            # All pending writes are committed in a single transaction. If any
+            # statement fails the transaction is rolled back and the writes are
+            # kept in the buffer, to be retried by the next flush.
+            with self as (db, cursor):
+                if not db:
+                    return False
+                try:
+                    with db:
+                        cursor.execute('BEGIN')
+                        if removed:
+                            cursor.executemany(self._sql['remove'], removed)
+                        if updated:
+                            cursor.executemany(self._sql['set'], updated)
+                except sqlite3.Error as exc:
+                    log_error('SQLStorage.flush - {exc}:\n{details}'.format(
+                        exc=exc, details=''.join(format_stack())
+                    ))
+                    return False
+
+            items.clear()
+            buffer['since'] = 0
+
+        self._optimize_item_count()
+        self._optimize_file_size()
+        return True
+
+    def _buffer_items(self, items):
+        buffer = self._buffer
+        with self._lock:
+            if not buffer['items']:
+                buffer['since'] = since_epoch()
+            buffer['items'].update(items)
+            flush = (len(buffer['items']) >= self._buffer_size
+                     or since_epoch() - buffer['since'] >= self._buffer_time)
+        if flush:
+            self.flush()
 
     def _open(self):
+        if self._filepath in self._connections:
+            self._close(self._filepath)
+
         if not os.path.exists(self._filepath):
             make_dirs(os.path.dirname(self._filepath))
             self._base._table_created = False
             self._base._table_updated = True
+            for (filepath, _), table in list(self._tables.items()):
+                if filepath == self._filepath:
+                    table._table_created = False
 
         for _ in range(3):
             try:
@@ -200,17 +533,19 @@ class Storage(object):
                     exc=exc, details=''.join(format_stack())
                 ))
                 if isinstance(exc, sqlite3.Error):
-                    return False
+                    return None, None
                 time.sleep(0.1)
         else:
-            return False
+            return None, None
 
         cursor = db.cursor()
         cursor.arraysize = 100
 
-        sql_script = [
+        self._prepare(cursor, [
+            'PRAGMA auto_vacuum = INCREMENTAL;',
             'PRAGMA busy_timeout = 1000;',
             'PRAGMA read_uncommitted = TRUE;',
+            'PRAGMA recursive_triggers = TRUE;',
             'PRAGMA secure_delete = FALSE;',
             'PRAGMA synchronous = NORMAL;',
             'PRAGMA locking_mode = NORMAL;'
@@ -219,15 +554,35 @@ class Storage(object):
             'PRAGMA page_size = 4096;',
             'PRAGMA cache_size = 1000;',
             'PRAGMA journal_mode = WAL;',
-        ]
+        ])
+
+        connection = self._connections[self._filepath] = [db, cursor]
+        return connection
+
+    def _prepare(self, cursor, sql_script=None):
+        if sql_script is None:
+            sql_script = []
         statements = []
+        vacuum = False
 
-        if not self._table_created:
-            statements.append(
-                self._sql['create_table']
-            )
+        if not self._base._table_created:
+            for result in self._execute(cursor,
+                                        self._sql['has_previous_table']):
+                if result[0] == 1:
+                    statements.append(self._sql['migrate_table'])
+                break
+            statements.extend((
+                self._sql['create_table'],
+                self._sql['create_index'],
+                self._sql['create_size_ledger'],
+            ))
+            # Switching an existing database to incremental auto_vacuum only
+            # takes effect after a full VACUUM, which is then no longer needed
+            for result in self._execute(cursor, 'PRAGMA auto_vacuum'):
+                vacuum = result[0] != 2
+                break
 
-        if not self._table_updated:
+        if not self._base._table_updated:
             for result in self._execute(cursor, self._sql['has_old_table']):
                 if result[0] == 1:
                     statements.extend((
@@ -235,29 +590,33 @@ class Storage(object):
                         self._sql['drop_old_table'],
                         'PRAGMA writable_schema = 0;',
                     ))
+                    vacuum = True
                 break
 
         if statements:
             transaction_begin = len(sql_script) + 1
-            sql_script.extend(('BEGIN;', 'COMMIT;', 'VACUUM;'))
+            sql_script.extend(('BEGIN;', 'COMMIT;'))
             sql_script[transaction_begin:transaction_begin] = statements
-        self._execute(cursor, '\n'.join(sql_script), script=True)
+        if vacuum:
+            sql_script.append('VACUUM;')
+        if sql_script:
+            self._execute(cursor, '\n'.join(sql_script), script=True)
 
         self._base._table_created = True
         self._base._table_updated = True
-        self._db = db
-        self._cursor = cursor
-
-    def _close(self):
-        if self._cursor:
-            self._execute(self._cursor, 'PRAGMA optimize')
-            self._cursor.close()
-            self._cursor = None
-        if self._db:
-            # Not needed if using self._db as a context manager
-            # self._db.commit()
-            self._db.close()
-            self._db = None
+
+    @classmethod
+    def _close(cls, filepath):
+        connection = Storage._connections.pop(filepath, None)
+        if not connection:
+            return
+        db, cursor = connection
+        # Only run optimize once, when the connection is no longer needed
+        cls._execute(cursor, 'PRAGMA optimize')
+        cursor.close()
+        # Not needed if using db as a context manager
+        # db.commit()
+        db.close()
 
     @staticmethod
     def _execute(cursor, query, values=None, many=False, script=False):
@@ -284,25 +643,49 @@ class Storage(object):
                 time.sleep(0.1)
         return []
 
+    def _vacuum(self, cursor, pages=None):
+        if pages is None:
+            pages = self._vacuum_pages
+        # Must be run as a script, otherwise only a single page is freed
+        self._execute(cursor,
+                      'PRAGMA incremental_vacuum({0});'.format(pages)
+                      if pages else
+                      'PRAGMA incremental_vacuum;',
+                      script=True)
+
     def _optimize_file_size(self, defer=False):
         # do nothing - optimize only if max size limit has been set
         if self._max_file_size_kb <= 0:
             return False
 
-        try:
-            file_size_kb = (os.path.getsize(self._filepath) // 1024)
-            if file_size_kb <= self._max_file_size_kb:
+        with self as (db, cursor), db:
+            result = self._execute(cursor, self._sql['get_total_size'])
+            size_kb = result.fetchone() if result else None
+            if not size_kb:
+                return False
+            size_kb = size_kb[0] // 1024
+            if size_kb <= self._max_file_size_kb:
                 return False
-        except OSError:
-            return False
 
-        prune_size = 1024 * int(file_size_kb - self._max_file_size_kb / 2)
-        query = self._sql['prune_by_size'].format(prune_size)
-        if defer:
-            return query
-        with self as (db, cursor), db:
+            # Walk the timestamp index from the oldest entry, only reading as
+            # many rows as need to be removed, to find the prune cut-off
+            prune_size = 1024 * int(size_kb - self._max_file_size_kb / 2)
+            pruned = 0
+            cut_off = None
+            for timestamp, size in self._execute(cursor,
+                                                 self._sql['get_oldest']):
+                pruned += size or 0
+                cut_off = timestamp
+                if pruned >= prune_size:
+                    break
+            if cut_off is None:
+                return False
+
+            query = self._sql['prune_by_size'].format(cut_off)
+            if defer:
+                return query
             self._execute(cursor, query)
-            self._execute(cursor, 'VACUUM')
+            self._vacuum(cursor)
         return True
 
     def _optimize_item_count(self, limit=-1, defer=False):
@@ -323,11 +706,16 @@ class Storage(object):
             return query
         with self as (db, cursor), db:
             self._execute(cursor, query)
-            self._execute(cursor, 'VACUUM')
+            self._vacuum(cursor)
         return True
 
-    def _set(self, item_id, item, timestamp=None):
-        values = self._encode(item_id, item, timestamp)
+    def _set(self, item_id, item, timestamp=None, seconds=None):
+        values = self._encode(item_id, item, timestamp, seconds)
+        if self._memory is not None:
+            self._memory.set(values[0], values, item)
+        if self._buffer is not None:
+            self._buffer_items({values[0]: values})
+            return
         optimize_query = self._optimize_item_count(1, defer=True)
         with self as (db, cursor), db:
             if optimize_query:
@@ -335,20 +723,27 @@ class Storage(object):
                 self._execute(cursor, optimize_query)
             self._execute(cursor, self._sql['set'], values=values)
 
-    def _set_many(self, items, flatten=False):
+    def _set_many(self, items, flatten=False, seconds=None):
         now = since_epoch()
         num_items = len(items)
 
+        values = [self._encode(*item, timestamp=now, seconds=seconds)
+                  for item in items.items()]
+
+        if self._memory is not None:
+            for value, item in zip(values, items.values()):
+                self._memory.set(value[0], value, item)
+
+        if self._buffer is not None:
+            self._buffer_items({value[0]: value for value in values})
+            return
+
         if flatten:
-            values = [enc_part
-                      for item in items.items()
-                      for enc_part in self._encode(*item, timestamp=now)]
+            values = [enc_part for value in values for enc_part in value]
             query = self._sql['set_flat'].format(
-                '(?,?,?,?),' * (num_items - 1) + '(?,?,?,?)'
+                '(?,?,?,?,?),' * (num_items - 1) + '(?,?,?,?,?)'
             )
         else:
-            values = [self._encode(*item, timestamp=now)
-                      for item in items.items()]
             query = self._sql['set']
 
         optimize_query = self._optimize_item_count(num_items, defer=True)
@@ -363,12 +758,105 @@ class Storage(object):
         query = self._sql['clear']
         if defer:
             return query
+        if self._buffer:
+            with self._lock:
+                self._buffer['items'].clear()
+        if self._memory is not None:
+            self._memory.clear()
         with self as (db, cursor), db:
             self._execute(cursor, query)
-            self._execute(cursor, 'VACUUM')
+            self._vacuum(cursor, pages=0)
+        return True
+
+    def drop(self):
+        """
+        Removes the table of this storage from the database. The table is
+        created again when the storage is next used.
+        :return:
+        """
+        with self._lock:
+            if self._buffer:
+                self._buffer['items'].clear()
+            if self._memory is not None:
+                self._memory.clear()
+            with self as (db, cursor):
+                self._execute(cursor, self._sql['drop_table'], script=True)
+                self._vacuum(cursor, pages=0)
+            self._base._table_created = False
+        return True
+
+    def delete(self):
+        """
+        Closes and deletes the database file used by this storage, including
+        the tables of any other storage using the same file.
+        :return: True if the file was deleted, False if it could not be
+                 deleted, e.g. as it is still open in another process
+        """
+        with self._lock:
+            if self._buffer:
+                self._buffer['items'].clear()
+            self._close(self._filepath)
+            for suffix in ('', '-wal', '-shm'):
+                filepath = self._filepath + suffix
+                if not os.path.exists(filepath):
+                    continue
+                try:
+                    os.remove(filepath)
+                except OSError as exc:
+                    log_error('SQLStorage.delete - Unable to delete |{path}|'
+                              ': {exc}'.format(path=filepath, exc=exc))
+                    return False
         return True
 
+    def import_from(self, source):
+        """
+        Copies all items of another storage into this storage. Items that
+        already exist in this storage are only replaced by newer items.
+        :param source: Storage to copy items from
+        :return: number of items copied
+        """
+        # Also upgrades the source table, and writes any pending changes
+        if source.is_empty():
+            return 0
+        query = self._sql['import_table'].format(source._table_name)
+        with self as (db, cursor):
+            if not db:
+                return 0
+            # Databases cannot be attached or detached within a transaction
+            self._execute(cursor, 'ATTACH DATABASE ? AS source;',
+                          (source._filepath,))
+            with db:
+                result = self._execute(cursor, query)
+                num_items = result.rowcount if result else 0
+            self._execute(cursor, 'DETACH DATABASE source;')
+        return num_items
+
+    def remove_expired(self, max_batches=10):
+        """
+        Removes rows that have expired, in batches of _expired_batch_size rows
+        :param max_batches: maximum number of batches to remove
+        :return: number of rows removed
+        """
+        if not self._filter_expired:
+            return 0
+        query = self._sql['prune_expired'].format(self._expired_batch_size)
+        removed = 0
+        for _ in range(max_batches):
+            # Each batch is committed separately, to avoid blocking other
+            # connections for the duration of a large removal
+            with self as (db, cursor), db:
+                result = self._execute(cursor, query, (since_epoch(),))
+                num_removed = result.rowcount if result else 0
+            removed += num_removed
+            if num_removed < self._expired_batch_size:
+                break
+        if removed:
+            with self as (db, cursor):
+                self._vacuum(cursor)
+        return removed
+
     def is_empty(self):
+        self.flush()
         with self as (db, cursor), db:
             result = self._execute(cursor, self._sql['is_empty'])
             for item in result:
@@ -378,78 +866,338 @@ class Storage(object):
                 is_empty = True
         return is_empty
 
-    @staticmethod
-    def _decode(obj, process=None, item=None):
-        decoded_obj = pickle.loads(obj)
+    def _decode(self, obj, process=None, item=None):
+        header = obj[0] if obj else None
+        # Python 2 sqlite3 returns buffer objects that index as 1 char strings
+        # and that zlib, pickle and marshal do not accept as a memoryview
+        is_buffer = isinstance(header, byte_string_type)
+        if is_buffer:
+            header = ord(header)
+
+        if header not in self._HEADERS:
+            decoded_obj = pickle.loads(obj)
+        else:
+            data = bytes(obj[1:]) if is_buffer else memoryview(obj)[1:]
+            compression = header & 0xF0
+            if compression == 0x10:
+                data = zlib.decompress(data)
+            elif compression == 0x20:
+                data = lzma.decompress(data)
+
+            serialiser = header & 0x0F
+            if serialiser == 0x01:
+                decoded_obj = pickle.loads(data)
+            elif serialiser == 0x02:
+                decoded_obj = marshal.loads(data)
+            else:
+                decoded_obj = json.loads(bytes(data).decode('utf-8'))
+
         if process:
             return process(decoded_obj, item)
         return decoded_obj
 
-    @staticmethod
-    def _encode(key, obj, timestamp=None):
+    def _serialise(self, obj):
+        codec = self._codec
+        data = None
+        if codec == 'marshal':
+            try:
+                data = marshal.dumps(obj)
+            except ValueError:
+                pass
+        elif codec == 'json':
+            try:
+                data = json.dumps(obj,
+                                  ensure_ascii=False,
+                                  separators=(',', ':')).encode('utf-8')
+            except (TypeError, ValueError):
+                pass
+        if data is None:
+            codec = 'pickle'
+            data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        header = self._SERIALISERS[codec]
+
+        compression = self._compression
+        if (compression and len(data) >= self._compression_threshold
+                and (compression != 'lzma' or lzma)):
+            if compression == 'lzma':
+                compressed = lzma.compress(data, preset=1)
+            else:
+                compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                data = compressed
+                header |= self._COMPRESSORS[compression]
+
+        return bytearray((header,)) + data
+
+    def _encode(self, key, obj, timestamp=None, seconds=None):
         timestamp = timestamp or since_epoch()
-        blob = sqlite3.Binary(pickle.dumps(
-            obj, protocol=pickle.HIGHEST_PROTOCOL
-        ))
+        blob = sqlite3.Binary(self._serialise(obj))
         size = getattr(blob, 'nbytes', None)
         if not size:
             size = int(memoryview(blob).itemsize) * len(blob)
-        return str(key), timestamp, blob, size
+        expires_at = timestamp + seconds if seconds else None
+        return str(key), timestamp, blob, size, expires_at
+
+    def _filter_values(self, seconds=None):
+        """
+        Values for the cut-off and expiry parameters of lookup queries
+        :param seconds: maximum age of the stored items
+        :return: tuple of (cut-off timestamp, current timestamp)
+        """
+        if not self._filter_expired:
+            return ()
+        now = since_epoch()
+        return (now - seconds if seconds else 0), now
+
+    @staticmethod
+    def _is_current(item, cut_off, now):
+        return item[1] >= cut_off and (item[4] is None or item[4] > now)
 
     def _get(self, item_id, process=None, seconds=None):
-        with self as (db, cursor), db:
-            result = self._execute(cursor, self._sql['get'], [str(item_id)])
-            item = result.fetchone() if result else None
-            if not item:
+        item_id = str(item_id)
+        filter_values = self._filter_values(seconds)
+        memory = self._memory
+        if memory is not None:
+            entry = memory.get(item_id)
+            if entry and self._is_current(entry[0], *filter_values):
+                item, value = entry
+                if value is None:
+                    value = self._decode(item[2])
+                return process(value, item) if process else value
+
+        buffer = self._buffer and self._buffer['items']
+        if buffer and item_id in buffer:
+            item = buffer[item_id]
+            if not item or not self._is_current(item, *filter_values):
                 return None
-        cut_off = since_epoch() - seconds if seconds else 0
-        if not cut_off or item[1] >= cut_off:
-            return self._decode(item[2], process, item)
-        return None
+        else:
+            with self as (db, cursor), db:
+                result = self._execute(cursor,
+                                       self._sql['get'],
+                                       (item_id,) + filter_values)
+                item = result.fetchone() if result else None
+                if not item:
+                    return None
+
+        value = self._decode(item[2])
+        if memory is not None:
+            memory.set(item_id, item, value)
+        return process(value, item) if process else value
 
     def _get_by_ids(self, item_ids=None, oldest_first=True, limit=-1,
                     seconds=None, process=None,
                     as_dict=False, values_only=False):
+        filter_values = self._filter_values(seconds)
         if not item_ids:
+            if self._buffer:
+                self.flush()
             if oldest_first:
                 query = self._sql['get_many']
             else:
                 query = self._sql['get_many_desc']
             query = query.format(limit)
+            with self as (db, cursor), db:
+                result = self._execute(cursor, query, filter_values)
+                result = result.fetchall() if result else []
+            decoded = [(item, self._decode(item[2])) for item in result]
         else:
-            num_ids = len(item_ids)
-            query = self._sql['get_by_key'].format('?,' * (num_ids - 1) + '?')
-            item_ids = tuple(item_ids)
+            decoded = self._get_many_by_id(tuple(map(str, item_ids)),
+                                           filter_values)
 
-        cut_off = since_epoch() - seconds if seconds else 0
-        with self as (db, cursor), db:
-            result = self._execute(cursor, query, item_ids)
-            if as_dict:
-                result = {
-                    item[0]: self._decode(item[2], process, item)
-                    for item in result if not cut_off or item[1] >= cut_off
-                }
-            elif values_only:
-                result = [
-                    self._decode(item[2], process, item)
-                    for item in result if not cut_off or item[1] >= cut_off
-                ]
-            else:
-                result = [
-                    (item[0],
-                     fromtimestamp(item[1]),
-                     self._decode(item[2], process, item))
-                    for item in result if not cut_off or item[1] >= cut_off
-                ]
-        return result
+        if process:
+            decoded = [(item, process(value, item)) for item, value in decoded]
+
+        if as_dict:
+            return {item[0]: value for item, value in decoded}
+        if values_only:
+            return [value for _, value in decoded]
+        return [
+            (item[0], fromtimestamp(item[1]), value)
+            for item, value in decoded
+        ]
+
+    def _get_many_by_id(self, item_ids, filter_values):
+        """
+        Gets items from memory, the write buffer, or the database, in the order
+        they were requested
+        :param item_ids: tuple of keys
+        :param filter_values: cut-off and expiry parameters of the lookup
+        :return: list of tuples of (row, decoded value)
+        """
+        memory = self._memory
+        buffer = self._buffer and self._buffer['items']
+        # {key: (row, decoded value or None, read from memory)}
+        found = {}
+        if memory is None and not buffer:
+            missing = item_ids
+        else:
+            missing = []
+            for item_id in item_ids:
+                if item_id in found:
+                    continue
+                entry = memory.get(item_id) if memory is not None else None
+                if entry and self._is_current(entry[0], *filter_values):
+                    found[item_id] = entry + (True,)
+                elif buffer and item_id in buffer:
+                    item = buffer[item_id]
+                    if item and self._is_current(item, *filter_values):
+                        found[item_id] = (item, None, False)
+                else:
+                    missing.append(item_id)
+            missing = tuple(missing)
+
+        if missing:
+            with self as (db, cursor), db:
+                for query, chunk in self._chunk_queries('get_by_key',
+                                                        missing):
+                    result = self._execute(cursor, query, chunk + filter_values)
+                    for item in result:
+                        found[item[0]] = (item, None, False)
+
+        decoded = []
+        for item_id in item_ids:
+            entry = found.pop(item_id, None)
+            if not entry:
+                continue
+            item, value, from_memory = entry
+            if value is None:
+                value = self._decode(item[2])
+            if memory is not None and not from_memory:
+                memory.set(item_id, item, value)
+            decoded.append((item, value))
+        return decoded
+
+    def _iter_rows(self, position=None, oldest_first=True, page_size=50,
+                   seconds=None):
+        """
+        Generator of stored rows, ordered by timestamp and key, read in pages
+        of page_size rows
+        :param position: tuple of (timestamp, key) of the row after which to
+                         start, or None to start from the first row
+        :param oldest_first: bool, order rows from oldest to newest
+        :param page_size: number of rows read per query
+        :param seconds: maximum age of the rows
+        :return: generator of rows
+        """
+        if self._buffer:
+            self.flush()
+        filter_values = self._filter_values(seconds)
+        if oldest_first:
+            query = self._sql['get_page'].format(page_size)
+            timestamp, key = position or (float('-inf'), '')
+        else:
+            query = self._sql['get_page_desc'].format(page_size)
+            timestamp, key = position or (float('inf'), '')
+
+        while 1:
+            # Each page is read separately, so the database is not locked
+            # while rows are being consumed
+            with self as (db, cursor), db:
+                result = self._execute(cursor,
+                                       query,
+                                       (timestamp, timestamp, key)
+                                       + filter_values)
+                rows = result.fetchall() if result else []
+            for item in rows:
+                yield item
+            if len(rows) < page_size:
+                break
+            key, timestamp = rows[-1][:2]
+
+    def _iter_items(self, position=None, oldest_first=True, page_size=50,
+                    seconds=None, process=None):
+        """
+        Generator of stored items, ordered by timestamp and key. Items are only
+        decoded when consumed.
+        :return: generator of tuples of (key, timestamp, value)
+        """
+        for item in self._iter_rows(position,
+                                    oldest_first=oldest_first,
+                                    page_size=page_size,
+                                    seconds=seconds):
+            yield item[0], item[1], self._decode(item[2], process, item)
+
+    def _get_page(self, page_token=None, limit=50, oldest_first=True,
+                  seconds=None, process=None):
+        """
+        Reads a single page of stored items, ordered by timestamp and key
+        :param page_token: token of the page to read, or None for the first
+        :param limit: maximum number of items in the page
+        :return: tuple of (list of (key, value) tuples, next page token or None)
+        """
+        position = None
+        if page_token:
+            timestamp, _, key = page_token.partition(',')
+            try:
+                position = (float(timestamp), key)
+            except ValueError:
+                pass
+
+        # One more row than needed is read to check for a next page, but only
+        # the rows in this page are decoded
+        rows = list(islice(self._iter_rows(position,
+                                           oldest_first=oldest_first,
+                                           page_size=limit + 1,
+                                           seconds=seconds),
+                           limit + 1))
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_page_token = '{1!r},{0}'.format(*rows[-1][:2])
+        else:
+            next_page_token = None
+        result = [(item[0], self._decode(item[2], process, item))
+                  for item in rows]
+        return result, next_page_token
 
     def _remove(self, item_id):
+        if self._memory is not None:
+            self._memory.pop(str(item_id))
+        if self._buffer is not None:
+            self._buffer_items({str(item_id): None})
+            return
         with self as (db, cursor), db:
             self._execute(cursor, self._sql['remove'], [item_id])
 
     def _remove_many(self, item_ids):
-        num_ids = len(item_ids)
-        query = self._sql['remove_by_key'].format('?,' * (num_ids - 1) + '?')
+        if self._memory is not None:
+            for item_id in item_ids:
+                self._memory.pop(str(item_id))
+        if self._buffer is not None:
+            self._buffer_items(dict.fromkeys(map(str, item_ids)))
+            return
         with self as (db, cursor), db:
-            self._execute(cursor, query, tuple(item_ids))
-            self._execute(cursor, 'VACUUM')
+            self._execute(cursor, 'BEGIN')
+            for query, chunk in self._chunk_queries('remove_by_key',
+                                                    tuple(item_ids)):
+                self._execute(cursor, query, chunk)
+        with self as (db, cursor):
+            self._vacuum(cursor)
+
+    def _chunk_queries(self, name, item_ids):
+        """
+        Splits keys into chunks, each bound to a statement of a fixed size
+        :param name: name of a statement with a {0} placeholder for the keys
+        :param item_ids: tuple of keys
+        :return: generator of tuples of (statement, chunk of keys)
+        """
+        chunk_sizes = self._chunk_sizes
+        max_size = chunk_sizes[-1]
+        for start in range(0, len(item_ids), max_size):
+            chunk = item_ids[start:start + max_size]
+            num_ids = len(chunk)
+            if num_ids < max_size:
+                size = next(size for size in chunk_sizes if size >= num_ids)
+                # Repeated keys do not change the result of the statement
+                chunk += chunk[-1:] * (size - num_ids)
+            else:
+                size = max_size
+            statement = '{0}_{1}'.format(name, size)
+            query = self._sql.get(statement)
+            if not query:
+                query = self._sql[statement] = self._sql[name].format(
+                    '?,' * (size - 1) + '?'
+                )
+            yield query, chunk
+
+
+atexit.register(Storage.close_all)
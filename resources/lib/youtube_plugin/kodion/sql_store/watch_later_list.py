@@ -15,18 +15,24 @@ from ..items import from_json
 
 
 class WatchLaterList(Storage):
-    _table_name = 'storage_v2'
+    _table_name = 'storage_v3'
     _table_created = False
     _table_updated = False
     _sql = {}
 
-    def __init__(self, filepath):
-        super(WatchLaterList, self).__init__(filepath)
+    def __init__(self, filepath, table_name=None):
+        super(WatchLaterList, self).__init__(filepath, table_name=table_name)
 
     def get_items(self):
         result = self._get_by_ids(process=from_json, as_dict=True)
         return result
 
+    def get_page(self, page_token=None, limit=50):
+        result, next_page_token = self._get_page(page_token,
+                                                 limit=limit,
+                                                 process=from_json)
+        return dict(result), next_page_token
+
     def add(self, video_id, item):
         self._set(video_id, item)
 
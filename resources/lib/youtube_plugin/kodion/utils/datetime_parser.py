@@ -293,6 +293,32 @@ def since_epoch(dt_object=None):
     return (dt_object - __INTERNAL_CONSTANTS__['epoch_dt']).total_seconds()
 
 
+def pacific_datetime(dt_object=None):
+    """
+    Converts a UTC datetime to US Pacific time, using the current US daylight
+    saving time rules. Used to determine when daily API quotas are reset.
+    :param dt_object: naive or aware UTC datetime, defaults to now
+    :return: naive datetime in US Pacific time
+    """
+    if dt_object is None:
+        dt_object = datetime.utcnow()
+    elif dt_object.tzinfo is not None:
+        dt_object = dt_object.replace(tzinfo=None) - dt_object.utcoffset()
+
+    year = dt_object.year
+    # Daylight saving time starts at 2:00 PST (10:00 UTC) on the second
+    # Sunday of March, and ends at 2:00 PDT (9:00 UTC) on the first Sunday
+    # of November
+    dst_start = datetime(year, 3, 8, 10)
+    dst_start += timedelta(days=(6 - dst_start.weekday()) % 7)
+    dst_end = datetime(year, 11, 1, 9)
+    dst_end += timedelta(days=(6 - dst_end.weekday()) % 7)
+
+    if dst_start <= dt_object < dst_end:
+        return dt_object - timedelta(hours=7)
+    return dt_object - timedelta(hours=8)
+
+
 def yt_datetime_offset(**kwargs):
     if timezone:
         _now = now(tz=timezone.utc)
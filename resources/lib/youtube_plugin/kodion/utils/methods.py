@@ -134,17 +134,23 @@ def select_stream(context, stream_data_list, quality_map_override=None, ask_for_
 
     sorted_stream_data_list = sorted(stream_data_list, key=_sort_stream_data)
 
-    context.log_debug('selectable streams: %d' % len(sorted_stream_data_list))
-    log_streams = []
-    for sorted_stream_data in sorted_stream_data_list:
-        log_data = copy.deepcopy(sorted_stream_data)
-        if 'license_info' in log_data:
-            log_data['license_info']['url'] = '[not shown]' if log_data['license_info'].get('url') else None
-            log_data['license_info']['token'] = '[not shown]' if log_data['license_info'].get('token') else None
-        else:
-            log_data['url'] = re.sub(r'ip=\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', 'ip=xxx.xxx.xxx.xxx', log_data['url'])
-        log_streams.append(log_data)
-    context.log_debug('selectable streams: \n%s' % '\n'.join(str(stream) for stream in log_streams))
+    # Only called if debug logging is enabled
+    def _log_streams():
+        log_streams = []
+        for sorted_stream_data in sorted_stream_data_list:
+            log_data = copy.deepcopy(sorted_stream_data)
+            if 'license_info' in log_data:
+                log_data['license_info']['url'] = '[not shown]' if log_data['license_info'].get('url') else None
+                log_data['license_info']['token'] = '[not shown]' if log_data['license_info'].get('token') else None
+            else:
+                log_data['url'] = re.sub(r'ip=\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', 'ip=xxx.xxx.xxx.xxx', log_data['url'])
+            log_streams.append(log_data)
+        return 'selectable streams: {num}\n{streams}'.format(
+            num=len(log_streams),
+            streams='\n'.join(str(stream) for stream in log_streams),
+        )
+
+    context.log_debug(_log_streams)
 
     selected_stream_data = None
     if ask_for_quality and len(sorted_stream_data_list) > 1:
@@ -159,12 +165,15 @@ def select_stream(context, stream_data_list, quality_map_override=None, ask_for_
     else:
         selected_stream_data = find_best_fit(sorted_stream_data_list, _find_best_fit_video)
 
-    if selected_stream_data is not None:
+    def _log_selected():
         log_data = copy.deepcopy(selected_stream_data)
         if 'license_info' in log_data:
             log_data['license_info']['url'] = '[not shown]' if log_data['license_info'].get('url') else None
             log_data['license_info']['token'] = '[not shown]' if log_data['license_info'].get('token') else None
-        context.log_debug('selected stream: %s' % log_data)
+        return 'selected stream: %s' % log_data
+
+    if selected_stream_data is not None:
+        context.log_debug(_log_selected)
 
     return selected_stream_data
 
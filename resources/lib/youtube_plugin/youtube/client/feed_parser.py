@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import heapq
+import xml.etree.ElementTree as ET
+
+from ...kodion.logger import log_error
+
+
+__all__ = (
+    'get_feed_ttl',
+    'merge_feeds',
+    'parse_feed',
+)
+
+
+class _LimitReached(Exception):
+    pass
+
+
+class _FeedTarget(object):
+    """
+    XMLParser target that collects the fields used from each entry of a
+    channel uploads feed, without building an element tree
+    """
+
+    ENTRY = '{http://www.w3.org/2005/Atom}entry'
+    FIELDS = {
+        '{http://www.youtube.com/xml/schemas/2015}videoId': 'id',
+        '{http://search.yahoo.com/mrss/}title': 'title',
+        '{http://www.w3.org/2005/Atom}name': 'channel',
+        '{http://www.w3.org/2005/Atom}published': 'published',
+    }
+
+    def __init__(self, limit=None):
+        self.entries = []
+        self._limit = limit
+        self._entry = None
+        self._field = None
+        self._text = []
+
+    def start(self, tag, _attrib):
+        if tag == self.ENTRY:
+            self._entry = {}
+        elif self._entry is not None and tag in self.FIELDS:
+            self._field = self.FIELDS[tag]
+            self._text = []
+
+    def data(self, data):
+        if self._field:
+            self._text.append(data)
+
+    def end(self, tag):
+        if self._field:
+            self._entry[self._field] = ''.join(self._text)
+            self._field = None
+        elif tag == self.ENTRY:
+            if self._entry.get('id'):
+                self.entries.append(self._entry)
+            self._entry = None
+            if self._limit and len(self.entries) >= self._limit:
+                raise _LimitReached
+
+    def close(self):
+        return self.entries
+
+
+def parse_feed(chunks, limit=None):
+    """
+    Incrementally parses a channel uploads feed, stopping once limit entries
+    have been parsed, so the remainder of the feed is not read
+    :param chunks: iterable of bytes of the feed XML, e.g. from
+                   requests.Response.iter_content
+    :param limit: maximum number of entries, None for all entries
+    :return: list of dicts of id, title, channel and published of each entry,
+             or of each entry parsed before an error
+    """
+    target = _FeedTarget(limit)
+    parser = ET.XMLParser(target=target)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+    except _LimitReached:
+        pass
+    except ET.ParseError as exc:
+        log_error('parse_feed - Failed to parse feed: {exc}'.format(exc=exc))
+    return target.entries
+
+
+def get_feed_ttl(entries, min_ttl, max_ttl):
+    """
+    Cache duration of a channel uploads feed, based on how often the channel
+    uploads
+    :param entries: list of feed entries with a timestamp, newest first
+    :param min_ttl: shortest cache duration, in seconds
+    :param max_ttl: longest cache duration, in seconds
+    :return: cache duration, in seconds
+    """
+    if len(entries) < 2:
+        return max_ttl
+    interval = ((entries[0]['timestamp'] - entries[-1]['timestamp'])
+                / (len(entries) - 1))
+    return min(max(interval / 8, min_ttl), max_ttl)
+
+
+def _decorate(index, entries):
+    for position, entry in enumerate(entries):
+        yield -entry['timestamp'], index, position, entry
+
+
+def merge_feeds(feeds):
+    """
+    Lazily merges feed entries into a single list, newest first, without
+    sorting all entries
+    :param feeds: iterable of lists of feed entries with a timestamp, each
+                  sorted newest first
+    :return: generator of feed entries
+    """
+    merged = heapq.merge(*[
+        _decorate(index, entries)
+        for index, entries in enumerate(feeds)
+        if entries
+    ])
+    return (entry for _, _, _, entry in merged)
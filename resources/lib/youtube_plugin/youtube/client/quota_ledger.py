@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+from datetime import datetime, timedelta
+from hashlib import md5
+from threading import Lock
+
+from ...kodion.utils.datetime_parser import pacific_datetime
+
+
+class QuotaLedger(object):
+    """
+    Estimated YouTube Data API quota usage of an API key, reset daily at
+    midnight US Pacific time, when the actual quota is reset.
+
+    Usage is estimated from the documented cost of each request, and is
+    stored in the data cache, so it is kept between plugin invocations.
+    """
+
+    DAILY_LIMIT = 10000
+    # Remaining budget, as a fraction of the daily limit, considered low
+    LOW_BUDGET = 0.2
+    # Multiplier of cache durations used while the remaining budget is low
+    LOW_BUDGET_TTL_FACTOR = 6
+
+    # See https://developers.google.com/youtube/v3/determine_quota_cost
+    COSTS = {
+        'search': 100,
+        'captions': 50,
+        'thumbnails': 50,
+        'videos/rate': 50,
+        'videos/reportAbuse': 50,
+        'watermarks': 50,
+    }
+    READ_COST = 1
+    WRITE_COST = 50
+
+    _lock = Lock()
+
+    def __init__(self, data_cache, api_key=None, daily_limit=DAILY_LIMIT):
+        self._cache = data_cache
+        md5_hash = md5()
+        md5_hash.update((api_key or '').encode('utf-8'))
+        self._cache_key = 'quota-ledger.' + md5_hash.hexdigest()
+        self._daily_limit = daily_limit
+
+    @staticmethod
+    def _today():
+        return pacific_datetime().strftime('%Y-%m-%d')
+
+    @staticmethod
+    def seconds_until_reset():
+        _now = pacific_datetime()
+        midnight = datetime(_now.year, _now.month, _now.day) + timedelta(days=1)
+        return (midnight - _now).total_seconds()
+
+    @classmethod
+    def get_cost(cls, path, method='GET'):
+        path = path.strip('/')
+        if path in cls.COSTS:
+            return cls.COSTS[path]
+        if method == 'GET':
+            return cls.READ_COST
+        return cls.WRITE_COST
+
+    def get_usage(self):
+        """
+        :return: dict of date, total units used, and units used per path
+        """
+        today = self._today()
+        usage = self._cache.get_item(self._cache_key, None)
+        if not usage or usage.get('date') != today:
+            usage = {'date': today, 'used': 0, 'paths': {}}
+        return usage
+
+    def record(self, path, method='GET'):
+        """
+        Records the estimated cost of an API request
+        :return: estimated units used by the request
+        """
+        cost = self.get_cost(path, method)
+        path = path.strip('/')
+        with self._lock:
+            usage = self.get_usage()
+            usage['used'] += cost
+            usage['paths'][path] = usage['paths'].get(path, 0) + cost
+            self._cache.set_item(self._cache_key,
+                                 usage,
+                                 self.seconds_until_reset())
+        return cost
+
+    def exhaust(self):
+        """
+        Marks the quota as used up, following a quotaExceeded API error
+        """
+        with self._lock:
+            usage = self.get_usage()
+            usage['used'] = max(usage['used'], self._daily_limit)
+            self._cache.set_item(self._cache_key,
+                                 usage,
+                                 self.seconds_until_reset())
+
+    def remaining(self):
+        return max(0, self._daily_limit - self.get_usage()['used'])
+
+    def is_low(self, path=None, method='GET'):
+        """
+        :param path: API path of a planned request, to include its cost
+        :param method: HTTP method of a planned request
+        :return: True if the remaining budget is low
+        """
+        remaining = self.remaining()
+        if path:
+            remaining -= self.get_cost(path, method)
+        return remaining < self._daily_limit * self.LOW_BUDGET
+
+    def get_max_ttl(self, seconds):
+        """
+        :param seconds: normal cache duration of a request result
+        :return: cache duration to store the request result for, so that it
+                 can be used for as long as get_ttl may allow, regardless of
+                 the remaining budget when it was stored
+        """
+        return max(seconds * self.LOW_BUDGET_TTL_FACTOR,
+                   self.seconds_until_reset())
+
+    def get_ttl(self, path, seconds, method='GET'):
+        """
+        :param path: API path of a planned request
+        :param seconds: normal cache duration of the request result
+        :param method: HTTP method of a planned request
+        :return: cache duration to use for the request result, longer when
+                 the remaining budget is low, and until the quota is reset
+                 if the request can no longer be afforded
+        """
+        remaining = self.remaining() - self.get_cost(path, method)
+        if remaining < 0:
+            return max(seconds, self.seconds_until_reset())
+        if remaining < self._daily_limit * self.LOW_BUDGET:
+            return seconds * self.LOW_BUDGET_TTL_FACTOR
+        return seconds
@@ -10,23 +10,22 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
-import threading
-import xml.etree.ElementTree as ET
+from base64 import urlsafe_b64encode
 from copy import deepcopy
 from itertools import chain, islice
 from operator import itemgetter
 from random import randint
+from threading import Event
+from time import time
 
+from .feed_parser import get_feed_ttl, merge_feeds, parse_feed
 from .login_client import LoginClient
+from .quota_ledger import QuotaLedger
 from ..helper.video_info import VideoInfo
 from ..youtube_exceptions import InvalidJSON, YouTubeException
 from ...kodion.compatibility import string_type
-from ...kodion.utils import (
-    current_system_version,
-    datetime_parser,
-    strip_html_from_text,
-    to_unicode,
-)
+from ...kodion.network import FetchPool, ValidatorCache
+from ...kodion.utils import datetime_parser, strip_html_from_text
 
 
 class YouTube(LoginClient):
@@ -128,6 +127,15 @@ class YouTube(LoginClient):
         },
     }
 
+    # Data API endpoints whose responses are stored for conditional requests.
+    # Other responses are either cached separately, e.g. by ResourceManager,
+    # or rarely requested again unchanged.
+    VALIDATOR_CACHE_PATHS = frozenset((
+        'playlistItems',
+        'playlists',
+        'subscriptions',
+    ))
+
     def __init__(self, context, **kwargs):
         self._context = context
         if 'items_per_page' in kwargs:
@@ -138,6 +146,10 @@ class YouTube(LoginClient):
     def get_max_results(self):
         return self._max_results
 
+    def get_quota_ledger(self):
+        return QuotaLedger(self._context.get_data_cache(),
+                           self._config.get('key') or self._config_tv['key'])
+
     def get_language(self):
         return self._language
 
@@ -146,27 +158,19 @@ class YouTube(LoginClient):
 
     @staticmethod
     def calculate_next_page_token(page, max_result):
-        page -= 1
-        low = 'AEIMQUYcgkosw048'
-        high = 'ABCDEFGHIJKLMNOP'
-        len_low = len(low)
-        len_high = len(high)
-
-        position = page * max_result
-
-        overflow_token = 'Q'
-        if position >= 128:
-            overflow_token_iteration = position // 128
-            overflow_token = '%sE' % high[overflow_token_iteration]
-        low_iteration = position % len_low
-
-        # at this position the iteration starts with 'I' again (after 'P')
-        if position >= 256:
-            multiplier = (position // 128) - 1
-            position -= 128 * multiplier
-        high_iteration = (position // len_low) % len_high
-
-        return 'C%s%s%sAA' % (high[high_iteration], low[low_iteration], overflow_token)
+        """
+        Page tokens are base64 encoded protobuf messages, with the position of
+        the first item of the page as a varint in field 1
+        """
+        position = (page - 1) * max_result
+        data = bytearray((0x08,))
+        while position > 0x7F:
+            data.append((position & 0x7F) | 0x80)
+            position >>= 7
+        data.append(position)
+        data.extend((0x10, 0x00))
+        token = urlsafe_b64encode(bytes(data)).decode('ascii')
+        return token.rstrip('=')
 
     def update_watch_history(self, context, video_id, url, status=None):
         if status is None:
@@ -633,6 +637,11 @@ class YouTube(LoginClient):
         form a recommended set.
         We cache aggressively because searches can be slow.
         Note this is a naive implementation and can be refined a lot more.
+
+        The ranked set is stored along with the history videos it was formed
+        from. Further pages are taken from the stored set, starting from the
+        position given by page_token. When the history changes, only related
+        items of new history videos are retrieved and merged into the set.
         """
 
         payload = {
@@ -640,8 +649,44 @@ class YouTube(LoginClient):
             'items': []
         }
 
+        cache = self._context.get_data_cache()
+        cache_key = 'get-activities-home'
+        items_per_page = self._max_results
+
+        def get_page(ranked_items, _page_token):
+            start = 0
+            if _page_token:
+                start, _, last_id = _page_token.partition('.')
+                try:
+                    start = min(int(start), len(ranked_items))
+                except ValueError:
+                    start = 0
+                # Find the last item of the previous page, in case items have
+                # been added or removed since the page_token was created
+                if not start or ranked_items[start - 1]['id'] != last_id:
+                    for idx, item in enumerate(ranked_items):
+                        if item['id'] == last_id:
+                            start = idx + 1
+                            break
+            end = start + items_per_page
+            payload['items'] = ranked_items[start:end]
+            if end < len(ranked_items):
+                payload['nextPageToken'] = '{0}.{1}'.format(
+                    end, ranked_items[end - 1]['id']
+                )
+            return payload
+
+        stored = cache.get_item(cache_key, None)
+        if page_token and stored:
+            return get_page(stored['items'], page_token)
+
         # Related videos are retrieved for the following num_items from history
         num_items = 10
+        # Maximum time, in seconds, to wait for related videos
+        time_limit = 10
+        # Maximum time, in seconds, to wait for running requests to end after
+        # the time limit is reached
+        cancel_time_limit = 1
         local_history = self._context.get_settings().use_local_history()
         history_id = self._context.get_access_manager().get_watch_history_id()
         if not history_id:
@@ -664,22 +709,31 @@ class YouTube(LoginClient):
                 except KeyError:
                     continue
 
-        # Fetch existing list of items, if any
-        cache = self._context.get_data_cache()
-        cache_items_key = 'get-activities-home-items'
-        cached = cache.get_item(cache_items_key, None) or []
+        # Use existing set of items, if any
+        if stored:
+            seeds = stored['seeds']
+            counts = stored['counts']
+            ranked = stored['items']
+        else:
+            seeds = []
+            counts = {
+                '_pages': {},
+                '_related': {},
+            }
+            ranked = []
+
+        if ranked and set(seeds) == set(video_ids):
+            return get_page(ranked, page_token)
 
         # Increase value to recursively retrieve recommendations for the first
         # recommended video, up to the set maximum recursion depth
         max_depth = 2
-        items_per_page = self._max_results
         diversity_limits = items_per_page // (num_items * max_depth)
         items = [[] for _ in range(max_depth * len(video_ids))]
-        counts = {
-            '_counter': 0,
-            '_pages': {},
-            '_related': {},
-        }
+        # Related videos of the first new recommendation of each group, to be
+        # retrieved at the next depth
+        # [(video_id, depth, {index_items kwargs})]
+        follow_ups = []
 
         def index_items(items, index,
                         item_store=None,
@@ -691,10 +745,7 @@ class YouTube(LoginClient):
             if original_ids is not None:
                 original_ids = list(original_ids)
 
-            running = 0
-            threads = []
-
-            for idx, item in enumerate(items):
+            for item in items:
                 if original_related is not None:
                     related = item['related_video_id'] = original_related
                 else:
@@ -721,11 +772,6 @@ class YouTube(LoginClient):
                     'channels': {channel: 1}
                 }
 
-                if item_store is None:
-                    if original_ids and related not in original_ids:
-                        items[idx] = None
-                    continue
-
                 if group is not None:
                     pass
                 elif original_ids and related in original_ids:
@@ -740,142 +786,187 @@ class YouTube(LoginClient):
                 if num_stored or depth <= 1:
                     continue
 
-                running += 1
-                thread = threading.Thread(
-                    target=threaded_get_related,
-                    args=(video_id, index_items, counts),
-                    kwargs={'item_store': item_store,
-                            'group': (group + 1),
-                            'depth': (depth - 1),
-                            'original_related': related,
-                            'original_channel': channel},
-                )
-                thread.daemon = True
-                threads.append(thread)
-                thread.start()
-
-            while running:
-                for thread in threads:
-                    thread.join(5)
-                    if not thread.is_alive():
-                        running -= 1
-
-        index_items(cached, counts, original_ids=video_ids)
-
-        # Fetch related videos. Use threads for faster execution.
-        def threaded_get_related(video_id, func, *args, **kwargs):
-            related = self.get_related_videos(video_id,
-                                              max_results=items_per_page)
-            if related and 'items' in related:
-                func(related['items'][:items_per_page], *args, **kwargs)
-
-        running = 0
-        threads = []
-        candidates = []
-        for video_id in video_ids:
-            if video_id in counts['_related']:
-                continue
-            running += 1
-            thread = threading.Thread(
-                target=threaded_get_related,
-                args=(video_id, candidates.extend),
-            )
-            thread.daemon = True
-            threads.append(thread)
-            thread.start()
-
-        while running:
-            for thread in threads:
-                thread.join(5)
-                if not thread.is_alive():
-                    running -= 1
-
-        num_items = items_per_page * num_items * max_depth
-        index_items(candidates[:num_items], counts,
-                    item_store=items,
-                    original_ids=video_ids,
-                    depth=max_depth)
-
-        # Truncate items to keep it manageable, and cache
-        items = list(chain.from_iterable(items))
-        counts['_counter'] = len(items)
-        remaining = num_items - counts['_counter']
-        if remaining > 0:
-            items.extend(islice(filter(None, cached), remaining))
-        elif remaining:
-            items = items[:num_items]
-
-        # Finally sort items per page by rank and date for a better distribution
-        def rank_and_sort(item):
-            if 'order' not in item:
-                counts['_counter'] += 1
-                item['order'] = counts['_counter']
-
-            page = 1 + item['order'] // (items_per_page * max_depth)
-            page_count = counts['_pages'].setdefault(page, {'_counter': 0})
-            while page_count['_counter'] < items_per_page and page > 1:
-                page -= 1
-                page_count = counts['_pages'].setdefault(page, {'_counter': 0})
-
-            related_video = item['related_video_id']
-            related_channel = item['related_channel_id']
+                follow_ups.append((video_id, max_depth - depth + 1, {
+                    'item_store': item_store,
+                    'group': group + 1,
+                    'depth': depth - 1,
+                    'original_related': related,
+                    'original_channel': channel,
+                }))
+
+        def get_page_count(page):
+            return counts['_pages'].setdefault(str(page), {'_counter': 0})
+
+        def get_page_keys(item):
+            keys = [item['related_video_id']]
+            if item['related_channel_id']:
+                keys.append(item['related_channel_id'])
             channel_id = item.get('snippet', {}).get('channelId')
             """
             # Video channel and related channel can be the same which can double
             # up the channel count. Checking for this allows more similar videos
             # in the recommendation, ignoring it allows for more variety.
             # Currently prefer not to check for this to allow more variety.
-            if channel_id == related_channel:
+            if channel_id == item['related_channel_id']:
                 channel_id = None
             """
-            while (page_count['_counter'] >= items_per_page
-                   or (related_video in page_count
-                       and page_count[related_video] >= diversity_limits)
-                   or (related_channel and related_channel in page_count
-                       and page_count[related_channel] >= diversity_limits)
-                   or (channel_id and channel_id in page_count
-                       and page_count[channel_id] >= diversity_limits)):
+            if channel_id:
+                keys.append(channel_id)
+            return keys
+
+        def unrank(item):
+            page_count = get_page_count(item['page'])
+            page_count['_counter'] -= 1
+            for key in get_page_keys(item):
+                if page_count.get(key):
+                    page_count[key] -= 1
+            counts.pop(item['id'], None)
+
+        # Remove items of videos no longer in history
+        removed = set(seeds).difference(video_ids)
+        if removed:
+            remaining_items = []
+            for item in ranked:
+                if item['related_video_id'] in removed:
+                    unrank(item)
+                else:
+                    remaining_items.append(item)
+            ranked = remaining_items
+            for video_id in removed:
+                counts['_related'].pop(video_id, None)
+
+        # Related videos of each video are cached, so videos that are related
+        # to more than one video in history are only requested once. Copies
+        # of the cached items are used, as items are updated when indexed.
+        # Results of requests still running after the time limit is reached
+        # are not cached, as the data cache may already have been closed.
+        cancelled = Event()
+
+        def get_related(video_id):
+            related_key = 'related-videos.' + video_id
+            related = cache.get_item(related_key, cache.ONE_DAY)
+            if not related:
+                related = self.get_related_videos(video_id,
+                                                  max_results=items_per_page)
+                if not related or 'items' not in related:
+                    return None
+                related = related['items'][:items_per_page]
+                if cancelled.is_set():
+                    return None
+                cache.set_item(related_key, related, cache.ONE_DAY)
+            return [dict(item) for item in related]
+
+        def is_failed(related):
+            return not related
+
+        # Related videos of new history videos are requested using a pool of
+        # threads, with the videos of shallower depths requested first.
+        # Results are indexed as they are received, until all are received or
+        # the time limit is reached, in which case the results received so
+        # far are used.
+        deadline = time() + time_limit
+        pool = FetchPool(is_error=is_failed)
+        requested = set(seeds)
+        pending = {}
+        for video_id in video_ids:
+            if video_id in requested:
+                continue
+            requested.add(video_id)
+            pending[pool.submit(get_related, video_id, _priority=0)] = {
+                'item_store': items,
+                'original_ids': video_ids,
+                'depth': max_depth,
+            }
+
+        while pending:
+            task = pool.next_completed(deadline - time())
+            if not task:
+                break
+            kwargs = pending.pop(task, None)
+            if kwargs is None or not task.result:
+                continue
+            index_items(task.result, counts, **kwargs)
+
+            for video_id, priority, kwargs in follow_ups:
+                if video_id in requested:
+                    continue
+                requested.add(video_id)
+                pending[pool.submit(get_related,
+                                    video_id,
+                                    _priority=priority)] = kwargs
+            del follow_ups[:]
+
+        if pending:
+            cancelled.set()
+            pool.cancel()
+            # Briefly wait for running requests, in case they were about to
+            # cache their results
+            end_time = time() + cancel_time_limit
+            for task in pending:
+                if not task.wait(max(0, end_time - time())):
+                    break
+            self._context.log_debug('get_related_for_home - Time limit reached,'
+                                    ' {num} requests incomplete',
+                                    num=len(pending))
+
+        # Rank new items per page by rank and date for a better distribution.
+        # Items already in the set keep their page, but new items are not
+        # limited to pages that are not yet full, so recommendations for new
+        # history videos are not all placed on the last pages.
+        fill_pages = not ranked
+
+        def rank(item):
+            page = 1 + item['order'] // (items_per_page * max_depth)
+            page_count = get_page_count(page)
+            while page_count['_counter'] < items_per_page and page > 1:
+                page -= 1
+                page_count = get_page_count(page)
+
+            page_keys = get_page_keys(item)
+            while ((fill_pages and page_count['_counter'] >= items_per_page)
+                   or any(page_count.get(key, 0) >= diversity_limits
+                          for key in page_keys)):
                 page += 1
-                page_count = counts['_pages'].setdefault(page, {'_counter': 0})
+                page_count = get_page_count(page)
 
-            page_count.setdefault(related_video, 0)
-            page_count[related_video] += 1
-            if related_channel:
-                page_count.setdefault(related_channel, 0)
-                page_count[related_channel] += 1
-            if channel_id:
-                page_count.setdefault(channel_id, 0)
-                page_count[channel_id] += 1
+            for key in page_keys:
+                page_count[key] = page_count.get(key, 0) + 1
             page_count['_counter'] += 1
             item['page'] = page
+            item['shuffle'] = randint(0, item['order'])
+
+        def sort_key(item):
+            return item['page'], -item['rank'], item['shuffle']
 
+        new_items = list(chain.from_iterable(items))
+        for item in new_items:
+            rank(item)
+        ranked.extend(new_items)
+
+        # Counts of items already in the set can have changed, so all ranks
+        # are updated, but the set is only re-sorted, as a merge of the
+        # existing sorted items and the new items
+        for item in ranked:
             item_count = counts[item['id']]
             item['rank'] = (2 * sum(item_count['channels'].values())
                             + sum(item_count['related'].values()))
+        ranked.sort(key=sort_key)
 
-            return (
-                -item['page'],
-                item['rank'],
-                -randint(0, item['order'])
-            )
-
-        items.sort(key=rank_and_sort, reverse=True)
-
-        # Finalize result
-        payload['items'] = items
-        """
-        # TODO:
-        # Enable pagination
-        payload['pageInfo'] = {
-            'resultsPerPage': 50,
-            'totalResults': len(sorted_items)
-        }
-        """
+        # Truncate items to keep it manageable, and cache
+        num_items = items_per_page * num_items * max_depth
+        if len(ranked) > num_items:
+            for item in ranked[num_items:]:
+                unrank(item)
+            del ranked[num_items:]
 
-        # Update cache
-        cache.set_item(cache_items_key, items)
+        cache.set_item(cache_key, {
+            'seeds': [video_id for video_id in video_ids
+                      if video_id in counts['_related']],
+            'counts': counts,
+            'items': ranked,
+        })
 
-        return payload
+        return get_page(ranked, page_token)
 
     def get_activities(self, channel_id, page_token='', **kwargs):
         params = {'part': 'snippet,contentDetails',
@@ -980,16 +1071,20 @@ class YouTube(LoginClient):
                                 params=params,
                                 **kwargs)
 
-    def get_channels(self, channel_id, **kwargs):
+    def get_channels(self, channel_id, parts=None, **kwargs):
         """
         Returns a collection of zero or more channel resources that match the request criteria.
         :param channel_id: list or comma-separated list of the YouTube channel ID(s)
+        :param parts: list of resource parts to retrieve, instead of the default
         :return:
         """
         if not isinstance(channel_id, string_type):
             channel_id = ','.join(channel_id)
 
-        params = {'part': 'snippet,contentDetails,brandingSettings'}
+        if not parts:
+            parts = ['snippet', 'contentDetails', 'brandingSettings']
+
+        params = {'part': ','.join(parts)}
         if channel_id != 'mine':
             params['id'] = channel_id
         else:
@@ -1016,19 +1111,22 @@ class YouTube(LoginClient):
                                 params=params,
                                 **kwargs)
 
-    def get_videos(self, video_id, live_details=False, **kwargs):
+    def get_videos(self, video_id, live_details=False, parts=None, **kwargs):
         """
         Returns a list of videos that match the API request parameters
         :param video_id: list of video ids
         :param live_details: also retrieve liveStreamingDetails
+        :param parts: list of resource parts to retrieve, instead of the
+                      default parts and liveStreamingDetails
         :return:
         """
         if not isinstance(video_id, string_type):
             video_id = ','.join(video_id)
 
-        parts = ['snippet', 'contentDetails', 'status', 'statistics']
-        if live_details:
-            parts.append('liveStreamingDetails')
+        if not parts:
+            parts = ['snippet', 'contentDetails', 'status', 'statistics']
+            if live_details:
+                parts.append('liveStreamingDetails')
 
         params = {'part': ','.join(parts),
                   'id': video_id}
@@ -1037,11 +1135,14 @@ class YouTube(LoginClient):
                                 params=params,
                                 **kwargs)
 
-    def get_playlists(self, playlist_id, **kwargs):
+    def get_playlists(self, playlist_id, parts=None, **kwargs):
         if not isinstance(playlist_id, string_type):
             playlist_id = ','.join(playlist_id)
 
-        params = {'part': 'snippet,contentDetails',
+        if not parts:
+            parts = ['snippet', 'contentDetails']
+
+        params = {'part': ','.join(parts),
                   'id': playlist_id}
         return self.api_request(method='GET',
                                 path='playlists',
@@ -1113,7 +1214,8 @@ class YouTube(LoginClient):
                                   method='POST',
                                   path='next',
                                   post_data=post_data,
-                                  no_login=True)
+                                  no_login=True,
+                                  coalesce=True)
         if not result:
             return {}
 
@@ -1465,14 +1567,16 @@ class YouTube(LoginClient):
 
             cache = self._context.get_data_cache()
 
-            # if new uploads is cached
-            cache_items_key = 'my-subscriptions-items'
-            cached = cache.get_item(cache_items_key, cache.ONE_HOUR) or []
-            if cached:
-                _result['items'] = cached
+            # Subscriptions are listed 50 per request, so cached channel ids
+            # are used for longer when the remaining quota is low
+            quota_ledger = self.get_quota_ledger()
+            cache_channels_key = 'my-subscriptions-channels'
+            sub_channel_ids = cache.get_item(
+                cache_channels_key,
+                quota_ledger.get_ttl('subscriptions', cache.ONE_HOUR),
+            )
 
-            """ no cache, get uploads data from web """
-            if not _result['items']:
+            if not sub_channel_ids:
                 # get all subscriptions channel ids
                 sub_page_token = True
                 sub_channel_ids = []
@@ -1512,6 +1616,30 @@ class YouTube(LoginClient):
                     if not sub_page_token:
                         break
 
+                # Update cache, keeping channel ids for longer than normally
+                # used, for when the remaining quota is low
+                cache.set_item(cache_channels_key,
+                               sub_channel_ids,
+                               quota_ledger.get_max_ttl(cache.ONE_HOUR))
+
+            # Uploads of each channel are cached separately, for a duration
+            # based on how often the channel uploads, and only feeds that
+            # have expired are requested again. Expired feeds are kept for
+            # use if a request fails.
+            feed_keys = {
+                channel_id: 'my-subscriptions-feed.' + channel_id
+                for channel_id in sub_channel_ids
+            }
+            feeds = cache.get_items(feed_keys.values(), cache.ONE_WEEK)
+            now = datetime_parser.since_epoch()
+            stale_channel_ids = [
+                channel_id
+                for channel_id, key in feed_keys.items()
+                if key not in feeds
+                or feeds[key]['updated'] + feeds[key]['ttl'] < now
+            ]
+
+            if stale_channel_ids:
                 headers = {
                     'Host': 'www.youtube.com',
                     'Connection': 'keep-alive',
@@ -1522,79 +1650,69 @@ class YouTube(LoginClient):
                     'Accept-Language': 'en-US,en;q=0.7,de;q=0.3'
                 }
 
-                responses = []
-
-                def fetch_xml(_url, _responses):
-                    _response = self.request(_url, headers=headers)
-                    if _response:
-                        _responses.append(_response)
-
-                threads = []
-                for channel_id in sub_channel_ids:
-                    thread = threading.Thread(
-                        target=fetch_xml,
-                        args=('https://www.youtube.com/feeds/videos.xml?channel_id=' + channel_id,
-                              responses)
-                    )
-                    threads.append(thread)
-                    thread.start()
-
-                for thread in threads:
-                    thread.join(30)
-
-                for response in responses:
-                    if response:
-                        response.encoding = 'utf-8'
-                        xml_data = to_unicode(response.content)
-                        xml_data = xml_data.replace('\n', '')
-                        if not current_system_version.compatible(19, 0):
-                            xml_data = xml_data.encode('utf-8')
-
-                        root = ET.fromstring(xml_data)
-
-                        ns = '{http://www.w3.org/2005/Atom}'
-                        yt_ns = '{http://www.youtube.com/xml/schemas/2015}'
-                        media_ns = '{http://search.yahoo.com/mrss/}'
-
-                        for entry in root.findall(ns + "entry"):
-                            # empty news dictionary
-                            entry_data = {
-                                'id': entry.find(yt_ns + 'videoId').text,
-                                'title': entry.find(media_ns + "group").find(media_ns + 'title').text,
-                                'channel': entry.find(ns + "author").find(ns + "name").text,
-                                'published': entry.find(ns + 'published').text,
-                            }
-                            # append items list
-                            _result['items'].append(entry_data)
-
-                # sorting by publish date
-                def _sort_by_date_time(item):
-                    return datetime_parser.since_epoch(
-                        datetime_parser.strptime(item['published'])
-                    )
-
-                _result['items'].sort(reverse=True, key=_sort_by_date_time)
+                validator_cache = ValidatorCache(cache)
+                per_channel = self._context.get_settings().subscriptions_per_channel()
+
+                # Feeds are parsed as soon as they are received, so only the
+                # entries, rather than every response, are kept in memory
+                def fetch_xml(_url):
+                    _response = self.request(_url,
+                                             headers=headers,
+                                             validator_cache=validator_cache)
+                    if not _response:
+                        return None
+                    return parse_feed(_response.iter_content(8192),
+                                      limit=per_channel)
+
+                pool = FetchPool(is_error=lambda _entries: _entries is None)
+                parsed_feeds = pool.map(
+                    fetch_xml,
+                    ['https://www.youtube.com/feeds/videos.xml?channel_id=' + channel_id
+                     for channel_id in stale_channel_ids],
+                    host='www.youtube.com',
+                )
 
-                # Update cache
-                cache.set_item(cache_items_key, _result['items'])
-            """ no cache, get uploads data from web """
+                updated_feeds = {}
+                for channel_id, entries in zip(stale_channel_ids,
+                                               parsed_feeds):
+                    if entries is None:
+                        continue
+                    for entry in entries:
+                        entry['timestamp'] = datetime_parser.since_epoch(
+                            datetime_parser.strptime(entry['published'])
+                        )
+                    entries.sort(key=itemgetter('timestamp'), reverse=True)
+                    updated_feeds[feed_keys[channel_id]] = {
+                        'updated': now,
+                        'ttl': get_feed_ttl(entries,
+                                            cache.ONE_HOUR,
+                                            cache.ONE_DAY),
+                        'entries': entries,
+                    }
+                if updated_feeds:
+                    cache.set_items(updated_feeds, cache.ONE_WEEK)
+                    feeds.update(updated_feeds)
 
-            # trim result
+            # Entries of each feed are already sorted by date, so pages are
+            # taken from a merge of the feeds, rather than sorting all entries
             if not _page_token:
                 _page_token = 0
-
             _page_token = int(_page_token)
+            _index_start = _page_token * self._max_results
+            _index_end = _index_start + self._max_results
 
-            if len(_result['items']) > self._max_results:
-                _index_start = _page_token * self._max_results
-                _index_end = _index_start + self._max_results
+            _result['items'] = list(islice(
+                merge_feeds(feeds[key]['entries']
+                            for key in feed_keys.values()
+                            if key in feeds),
+                _index_start,
+                _index_end + 1,
+            ))
 
-                _items = _result['items']
-                _items = _items[_index_start:_index_end]
-                _result['items'] = _items
+            if len(_result['items']) > self._max_results:
+                del _result['items'][self._max_results:]
                 _result['next_page_token'] = _page_token + 1
-
-            if len(_result['items']) < self._max_results:
+            else:
                 if 'continue' in _result:
                     del _result['continue']
 
@@ -1745,8 +1863,9 @@ class YouTube(LoginClient):
 
     def _response_hook(self, **kwargs):
         response = kwargs['response']
-        self._context.log_debug('API response: |{0.status_code}|\n'
-                                'headers: |{0.headers}|'.format(response))
+        self._context.log_debug('API response: |{response.status_code}|\n'
+                                'headers: |{response.headers}|',
+                                response=response)
         if response.status_code == 204 and 'no_content' in kwargs:
             return True
         try:
@@ -1781,6 +1900,9 @@ class YouTube(LoginClient):
         reason = details.get('errors', [{}])[0].get('reason', 'Unknown')
         message = strip_html_from_text(details.get('message', 'Unknown error'))
 
+        if reason in ('quotaExceeded', 'dailyLimitExceeded'):
+            self.get_quota_ledger().exhaust()
+
         if getattr(exc, 'notify', True):
             ok_dialog = False
             timeout = 5000
@@ -1818,6 +1940,7 @@ class YouTube(LoginClient):
                     post_data=None,
                     headers=None,
                     no_login=False,
+                    coalesce=False,
                     **kwargs):
         client_data = {
             '_endpoint': path.strip('/'),
@@ -1844,40 +1967,54 @@ class YouTube(LoginClient):
         if method != 'POST' and 'json' in client:
             del client['json']
 
-        params = client.get('params')
-        if params:
-            log_params = deepcopy(params)
-            if 'location' in log_params:
-                log_params['location'] = '|xx.xxxx,xx.xxxx|'
-            if 'key' in log_params:
-                key = log_params['key']
-                log_params['key'] = '...'.join((key[:3], key[-3:]))
-        else:
-            log_params = None
+        if (method == 'GET' and version == 3
+                and path.strip('/') in self.VALIDATOR_CACHE_PATHS):
+            client['validator_cache'] = ValidatorCache(
+                self._context.get_data_cache()
+            )
 
-        headers = client.get('headers')
-        if headers:
-            log_headers = deepcopy(headers)
-            if 'Authorization' in log_headers:
-                log_headers['Authorization'] = '|logged in|'
-        else:
-            log_headers = None
-
-        self._context.log_debug('API request:\n'
-                                'version: |{version}|\n'
-                                'method: |{method}|\n'
-                                'path: |{path}|\n'
-                                'params: |{params}|\n'
-                                'post_data: |{data}|\n'
-                                'headers: |{headers}|'
-                                .format(version=version,
-                                        method=method,
-                                        path=path,
-                                        params=log_params,
-                                        data=client.get('json'),
-                                        headers=log_headers))
+        if version == 3:
+            self.get_quota_ledger().record(path, method)
+
+        # Only called if debug logging is enabled
+        def _log_request():
+            params = client.get('params')
+            if params:
+                log_params = deepcopy(params)
+                if 'location' in log_params:
+                    log_params['location'] = '|xx.xxxx,xx.xxxx|'
+                if 'key' in log_params:
+                    key = log_params['key']
+                    log_params['key'] = '...'.join((key[:3], key[-3:]))
+            else:
+                log_params = None
+
+            headers = client.get('headers')
+            if headers:
+                log_headers = deepcopy(headers)
+                if 'Authorization' in log_headers:
+                    log_headers['Authorization'] = '|logged in|'
+            else:
+                log_headers = None
+
+            return ('API request:\n'
+                    'version: |{version}|\n'
+                    'method: |{method}|\n'
+                    'path: |{path}|\n'
+                    'params: |{params}|\n'
+                    'post_data: |{data}|\n'
+                    'headers: |{headers}|'
+                    .format(version=version,
+                            method=method,
+                            path=path,
+                            params=log_params,
+                            data=client.get('json'),
+                            headers=log_headers))
+
+        self._context.log_debug(_log_request)
         response = self.request(response_hook=self._response_hook,
                                 response_hook_kwargs=kwargs,
                                 error_hook=self._error_hook,
+                                coalesce=coalesce,
                                 **client)
         return response
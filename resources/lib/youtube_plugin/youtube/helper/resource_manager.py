@@ -10,8 +10,41 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+from time import time
+
+from ...kodion.network import FetchPool
+from ...kodion.sql_store import DataCache
+
 
 class ResourceManager(object):
+    # Maximum age, in seconds, of each part of cached resources. Only the
+    # stale parts of cached resources are requested again, and merged with
+    # the cached parts.
+    PART_TTLS = {
+        'channels': {
+            'snippet': DataCache.ONE_WEEK,
+            'contentDetails': DataCache.ONE_MONTH,
+            'brandingSettings': DataCache.ONE_WEEK,
+        },
+        'playlists': {
+            'snippet': DataCache.ONE_MONTH,
+            'contentDetails': DataCache.ONE_DAY,
+        },
+        'videos': {
+            'snippet': DataCache.ONE_MONTH,
+            'contentDetails': DataCache.ONE_MONTH,
+            'status': DataCache.ONE_DAY,
+            'statistics': 6 * DataCache.ONE_HOUR,
+            'liveStreamingDetails': DataCache.ONE_MONTH,
+        },
+    }
+    # Maximum age of parts of live and upcoming videos, which change until
+    # the broadcast has ended
+    LIVE_PART_TTLS = {
+        'snippet': DataCache.ONE_MINUTE,
+        'liveStreamingDetails': DataCache.ONE_MINUTE,
+    }
+
     def __init__(self, context, client):
         self._context = context
         self._client = client
@@ -29,6 +62,135 @@ class ResourceManager(object):
         for i in range(0, len(input_list), n):
             yield input_list[i:i + n]
 
+    def _get_stale_parts(self, resource_type, item, parts, now):
+        """
+        :param resource_type: 'channels', 'playlists' or 'videos'
+        :param item: cached resource, or None if not cached
+        :param parts: tuple of parts of the resource that are required
+        :param now: current time, as a timestamp
+        :return: tuple of required parts that are not cached, or are older
+                 than the ttl of the part
+        """
+        if item is None or item.get('partial'):
+            return parts
+        # Resources that were not found are cached as an empty dict
+        if not item:
+            return ()
+
+        ttls = self.PART_TTLS[resource_type]
+        if (resource_type == 'videos'
+                and item.get('snippet', {}).get('liveBroadcastContent',
+                                                'none') != 'none'):
+            ttls = dict(ttls, **self.LIVE_PART_TTLS)
+        updated = item.get('_updated') or {}
+        return tuple(part for part in parts
+                     if now - updated.get(part, 0) > ttls[part])
+
+    def _update_items(self,
+                      resource_type,
+                      method,
+                      ids,
+                      cached,
+                      parts,
+                      cache_missing=False,
+                      **kwargs):
+        """
+        Requests the stale parts of resources and merges them with the cached
+        parts. Resources with the same stale parts are requested together.
+        :param resource_type: 'channels', 'playlists' or 'videos'
+        :param method: client method used to request a batch of ids
+        :param ids: list of ids of resources
+        :param cached: dict of cached resources, by id
+        :param parts: tuple of parts of the resources that are required
+        :param cache_missing: store resources that were not found as an empty
+                              dict, rather than requesting them again
+        :param kwargs: keyword arguments of method
+        :return: dict of updated resources, by id
+        """
+        now = time()
+        to_update = {}
+        for id_ in ids:
+            stale_parts = self._get_stale_parts(resource_type,
+                                                cached.get(id_),
+                                                parts,
+                                                now)
+            if stale_parts:
+                to_update.setdefault(stale_parts, []).append(id_)
+
+        new_data = {}
+        for stale_parts, stale_ids in to_update.items():
+            self._context.log_debug('Requesting {parts} for {type}:\n|{ids}|',
+                                    parts=stale_parts,
+                                    type=resource_type,
+                                    ids=stale_ids)
+            for batch_ids, batch in self._get_batches(method,
+                                                      stale_ids,
+                                                      parts=stale_parts,
+                                                      **kwargs):
+                if not batch or 'error' in batch:
+                    continue
+                items = {
+                    yt_item['id']: yt_item
+                    for yt_item in batch.get('items', [])
+                    if yt_item
+                }
+                for id_ in batch_ids:
+                    yt_item = items.get(id_)
+                    if not yt_item:
+                        if cache_missing:
+                            new_data[id_] = {}
+                        continue
+                    item = cached.get(id_)
+                    if not item or item.get('partial'):
+                        item = {}
+                    # Copy, rather than modify, the cached resource, and
+                    # remove stale parts that are no longer included
+                    item = {
+                        key: value
+                        for key, value in item.items()
+                        if key not in stale_parts
+                    }
+                    updated = dict(item.get('_updated') or {})
+                    updated.update(dict.fromkeys(stale_parts, now))
+                    item.update(yt_item)
+                    item['_updated'] = updated
+                    new_data[id_] = item
+        return new_data
+
+    def _get_batches(self, method, ids, **kwargs):
+        """
+        Requests data for ids in batches of 50, running the requests
+        concurrently if there is more than one batch. A failed batch does not
+        prevent the results of other batches from being used.
+        :param method: client method used to request a batch of ids
+        :param ids: list of ids to request
+        :param kwargs: keyword arguments of method
+        :return: list of tuples of (batch of ids, result), in the order of
+                 ids, excluding failed batches
+        """
+        batches = list(self._list_batch(ids, n=50))
+        if len(batches) == 1:
+            return [(batches[0], method(batches[0], **kwargs))]
+
+        pool = FetchPool(
+            is_error=lambda _batch: not _batch or 'error' in _batch
+        )
+        tasks = [pool.submit(method, batch, _host='www.googleapis.com', **kwargs)
+                 for batch in batches]
+        pool.join(tasks)
+
+        results = []
+        exc = None
+        for batch, task in zip(batches, tasks):
+            if task.exc is not None:
+                exc = exc or task.exc
+            elif task.state == task.DONE:
+                results.append((batch, task.result))
+        # Only raise if all batches failed, to match a single batch request
+        if exc and not results:
+            raise exc
+        return results
+
     def get_channels(self, ids, defer_cache=False):
         refresh = self._context.get_param('refresh')
         updated = []
@@ -60,30 +222,23 @@ class ResourceManager(object):
             result = {}
         else:
             result = self._data_cache.get_items(ids, self._data_cache.ONE_MONTH)
-        to_update = [id_ for id_ in ids
-                     if id_ not in result or result[id_].get('partial')]
 
         if result:
-            self._context.log_debug('Found cached data for channels:\n|{ids}|'
-                                    .format(ids=list(result)))
-
-        if to_update:
-            new_data = [self._client.get_channels(list_of_50)
-                        for list_of_50 in self._list_batch(to_update, n=50)]
-            if not any(new_data):
-                new_data = None
-        else:
-            new_data = None
+            self._context.log_debug(
+                lambda: 'Found cached data for channels:\n|{ids}|'
+                        .format(ids=list(result))
+            )
+
+        new_data = self._update_items('channels',
+                                      self._client.get_channels,
+                                      ids,
+                                      result,
+                                      tuple(self.PART_TTLS['channels']),
+                                      coalesce=True)
 
         if new_data:
-            self._context.log_debug('Got data for channels:\n|{ids}|'
-                                    .format(ids=to_update))
-            new_data = {
-                yt_item['id']: yt_item
-                for batch in new_data
-                for yt_item in batch.get('items', [])
-                if yt_item
-            }
+            self._context.log_debug('Got data for channels:\n|{ids}|',
+                                    ids=list(new_data))
             result.update(new_data)
             self.cache_data(new_data, defer=defer_cache)
 
@@ -127,30 +282,23 @@ class ResourceManager(object):
             result = {}
         else:
             result = self._data_cache.get_items(ids, self._data_cache.ONE_MONTH)
-        to_update = [id_ for id_ in ids
-                     if id_ not in result or result[id_].get('partial')]
 
         if result:
-            self._context.log_debug('Found cached data for playlists:\n|{ids}|'
-                                    .format(ids=list(result)))
-
-        if to_update:
-            new_data = [self._client.get_playlists(list_of_50)
-                        for list_of_50 in self._list_batch(to_update, n=50)]
-            if not any(new_data):
-                new_data = None
-        else:
-            new_data = None
+            self._context.log_debug(
+                lambda: 'Found cached data for playlists:\n|{ids}|'
+                        .format(ids=list(result))
+            )
+
+        new_data = self._update_items('playlists',
+                                      self._client.get_playlists,
+                                      ids,
+                                      result,
+                                      tuple(self.PART_TTLS['playlists']),
+                                      coalesce=True)
 
         if new_data:
-            self._context.log_debug('Got data for playlists:\n|{ids}|'
-                                    .format(ids=to_update))
-            new_data = {
-                yt_item['id']: yt_item
-                for batch in new_data
-                for yt_item in batch.get('items', [])
-                if yt_item
-            }
+            self._context.log_debug('Got data for playlists:\n|{ids}|',
+                                    ids=list(new_data))
             result.update(new_data)
             self.cache_data(new_data, defer=defer_cache)
 
@@ -204,30 +352,35 @@ class ResourceManager(object):
                     break
 
         if result:
-            self._context.log_debug('Found cached items for playlists:\n|{ids}|'
-                                    .format(ids=list(result)))
+            self._context.log_debug(
+                lambda: 'Found cached items for playlists:\n|{ids}|'
+                        .format(ids=list(result))
+            )
 
         new_data = {}
         insert_point = 0
         for playlist_id, page_token in to_update:
-            new_batch_ids = []
             batch_id = (playlist_id, page_token)
             insert_point = batch_ids.index(batch_id, insert_point)
-            while 1:
-                batch_id = (playlist_id, page_token)
-                new_batch_ids.append(batch_id)
-                batch = self._client.get_playlist_items(*batch_id)
-                new_data[batch_id] = batch
-                page_token = batch.get('nextPageToken') if fetch_next else None
-                if page_token is None:
-                    batch_ids[insert_point:insert_point] = new_batch_ids
-                    insert_point += len(new_batch_ids)
-                    break
+            if fetch_next:
+                page = 1 + sum(1 for _batch_id in batch_ids[:insert_point]
+                               if _batch_id[0] == playlist_id)
+                batches = self._get_playlist_pages(playlist_id,
+                                                   page_token,
+                                                   page)
+            else:
+                batches = [(batch_id, self._client.get_playlist_items(
+                    *batch_id
+                ))]
+            new_batch_ids = [batch_id for batch_id, _ in batches]
+            new_data.update(batches)
+            batch_ids[insert_point:insert_point] = new_batch_ids
+            insert_point += len(new_batch_ids)
 
         if new_data:
             to_update = list(new_data)
-            self._context.log_debug('Got items for playlists:\n|{ids}|'
-                                    .format(ids=to_update))
+            self._context.log_debug('Got items for playlists:\n|{ids}|',
+                                    ids=to_update)
             result.update(new_data)
             self.cache_data(new_data, defer=defer_cache)
 
@@ -242,6 +395,91 @@ class ResourceManager(object):
 
         return result
 
+    def _get_playlist_pages(self, playlist_id, page_token, page):
+        """
+        Gets a page of playlist items and all following pages.
+        Following pages are requested concurrently, using page tokens
+        calculated from the total number of items. Each page is checked using
+        the position of its first item, and remaining pages are requested one
+        at a time, using nextPageToken, if a calculated token is not accepted.
+        :param playlist_id: id of the playlist
+        :param page_token: page token of the first page
+        :param page: number of the first page, starting from 1
+        :return: list of tuples of ((playlist_id, page_token), page of items)
+        """
+        client = self._client
+        batch = client.get_playlist_items(playlist_id, page_token)
+        batches = [((playlist_id, page_token), batch)]
+        page_token = batch.get('nextPageToken')
+        if not page_token:
+            return batches
+
+        page_info = batch.get('pageInfo', {})
+        per_page = int(page_info.get('resultsPerPage', 0))
+        total = int(page_info.get('totalResults', 0))
+        last_page = -(-total // per_page) if per_page else 0
+        next_page = page + 1
+
+        def is_page(_batch, _page):
+            try:
+                position = _batch['items'][0]['snippet']['position']
+            except (KeyError, IndexError, TypeError):
+                return False
+            return position == (_page - 1) * per_page
+
+        tokens = {
+            _page: client.calculate_next_page_token(_page, per_page)
+            for _page in range(next_page + 1, last_page + 1)
+        }
+        tokens[next_page] = page_token
+
+        def fetch(_page):
+            return client.get_playlist_items(playlist_id,
+                                             tokens[_page],
+                                             notify=False)
+
+        fetched = {}
+        if len(tokens) > 1:
+            # If the calculated token does not match the actual token, check
+            # that a calculated token is accepted before using the others
+            if (client.calculate_next_page_token(next_page, per_page)
+                    != page_token):
+                fetched[next_page + 1] = fetch(next_page + 1)
+                if not is_page(fetched[next_page + 1], next_page + 1):
+                    tokens = {next_page: page_token}
+
+        if len(tokens) > 1:
+            pages = [_page for _page in sorted(tokens)
+                     if _page not in fetched]
+            pool = FetchPool(
+                is_error=lambda _batch: not _batch or 'error' in _batch
+            )
+            fetched.update(zip(pages, pool.map(fetch,
+                                               pages,
+                                               host='www.googleapis.com')))
+
+            # Pages are stored using the actual page tokens, the same as when
+            # the pages are requested one at a time
+            for _page in range(next_page, last_page + 1):
+                batch = fetched.get(_page)
+                if not is_page(batch, _page):
+                    self._context.log_debug('Playlist |{id}| page {page} not'
+                                            ' found, requesting remaining'
+                                            ' pages in order',
+                                            id=playlist_id,
+                                            page=_page)
+                    break
+                batches.append(((playlist_id, page_token), batch))
+                page_token = batch.get('nextPageToken')
+                if not page_token:
+                    break
+
+        while page_token:
+            batch = client.get_playlist_items(playlist_id, page_token)
+            batches.append(((playlist_id, page_token), batch))
+            page_token = batch.get('nextPageToken')
+        return batches
+
     def get_related_playlists(self, channel_id, defer_cache=False):
         result = self.get_channels((channel_id,), defer_cache=defer_cache)
 
@@ -270,35 +508,29 @@ class ResourceManager(object):
             result = {}
         else:
             result = self._data_cache.get_items(ids, self._data_cache.ONE_MONTH)
-        to_update = [id_ for id_ in ids
-                     if id_ not in result or result[id_].get('partial')]
 
         if result:
-            self._context.log_debug('Found cached data for videos:\n|{ids}|'
-                                    .format(ids=list(result)))
-
-        if to_update:
-            notify_and_raise = not suppress_errors
-            new_data = [self._client.get_videos(list_of_50,
-                                                live_details,
-                                                notify=notify_and_raise,
-                                                raise_exc=notify_and_raise)
-                        for list_of_50 in self._list_batch(to_update, n=50)]
-            if not any(new_data):
-                new_data = None
-        else:
-            new_data = None
+            self._context.log_debug(
+                lambda: 'Found cached data for videos:\n|{ids}|'
+                        .format(ids=list(result))
+            )
+
+        parts = tuple(part for part in self.PART_TTLS['videos']
+                      if live_details or part != 'liveStreamingDetails')
+        notify_and_raise = not suppress_errors
+        new_data = self._update_items('videos',
+                                      self._client.get_videos,
+                                      ids,
+                                      result,
+                                      parts,
+                                      cache_missing=True,
+                                      notify=notify_and_raise,
+                                      raise_exc=notify_and_raise,
+                                      coalesce=True)
 
         if new_data:
-            self._context.log_debug('Got data for videos:\n|{ids}|'
-                                    .format(ids=to_update))
-            new_data = {
-                yt_item['id']: yt_item
-                for batch in new_data
-                for yt_item in batch.get('items', [])
-                if yt_item
-            }
-            new_data = dict(dict.fromkeys(to_update, {}), **new_data)
+            self._context.log_debug('Got data for videos:\n|{ids}|',
+                                    ids=list(new_data))
             result.update(new_data)
             self.cache_data(new_data, defer=defer_cache)
 
@@ -328,6 +560,8 @@ class ResourceManager(object):
 
         data = data or self.new_data
         if data:
-            self._data_cache.set_items(data)
-            self._context.log_debug('Cached data for items:\n|{ids}|'
-                                    .format(ids=list(data)))
+            self._data_cache.set_items(data, self._data_cache.ONE_MONTH)
+            self._context.log_debug(
+                lambda: 'Cached data for items:\n|{ids}|'
+                        .format(ids=list(data))
+            )
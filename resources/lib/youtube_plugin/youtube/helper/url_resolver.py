@@ -244,6 +244,7 @@ class UrlResolver(object):
             self._resolve,
             self._function_cache.ONE_DAY,
             _refresh=self._context.get_param('refresh'),
+            _stale_ttl=self._function_cache.ONE_WEEK,
             url=url
         )
         if not resolved_url or resolved_url == '/':
@@ -10,8 +10,6 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
-from threading import Thread
-
 from .utils import (
     filter_short_videos,
     get_thumbnail,
@@ -24,6 +22,7 @@ from .utils import (
 from ...kodion.constants import paths
 from ...kodion import KodionException
 from ...kodion.items import DirectoryItem, NextPageItem, VideoItem, menu_items
+from ...kodion.network import FetchPool
 
 
 def _process_list_response(provider, context, json_data):
@@ -204,7 +203,7 @@ def _process_list_response(provider, context, json_data):
                 'suppress_errors': True,
                 'defer_cache': True,
             },
-            'thread': None,
+            'task': None,
             'updater': update_video_infos,
             'upd_args': (
                 provider,
@@ -225,7 +224,7 @@ def _process_list_response(provider, context, json_data):
             'fetcher': resource_manager.get_playlists,
             'args': (playlist_id_dict,),
             'kwargs': {'defer_cache': True},
-            'thread': None,
+            'task': None,
             'updater': update_playlist_infos,
             'upd_args': (
                 provider,
@@ -241,7 +240,7 @@ def _process_list_response(provider, context, json_data):
             'fetcher': resource_manager.get_channels,
             'args': (channel_id_dict,),
             'kwargs': {'defer_cache': True},
-            'thread': None,
+            'task': None,
             'updater': update_channel_infos,
             'upd_args': (
                 provider,
@@ -258,7 +257,7 @@ def _process_list_response(provider, context, json_data):
             'fetcher': resource_manager.get_fanarts,
             'args': (channel_items_dict,),
             'kwargs': {'defer_cache': True},
-            'thread': None,
+            'task': None,
             'updater': update_fanarts,
             'upd_args': (
                 provider,
@@ -273,7 +272,7 @@ def _process_list_response(provider, context, json_data):
             'fetcher': resource_manager.cache_data,
             'args': (),
             'kwargs': {},
-            'thread': None,
+            'task': None,
             'updater': None,
             'upd_args': (),
             'upd_kwargs': {},
@@ -287,9 +286,12 @@ def _process_list_response(provider, context, json_data):
             *resource['args'], **resource['kwargs']
         )
         if not data or not resource['updater']:
-            return
+            return data
         resource['upd_kwargs']['data'] = data
         resource['updater'](*resource['upd_args'], **resource['upd_kwargs'])
+        return data
+
+    pool = FetchPool(is_error=lambda data: not data)
 
     remaining = len(resources)
     deferred = sum(1 for resource in resources.values() if resource['defer'])
@@ -318,18 +320,14 @@ def _process_list_response(provider, context, json_data):
             remaining -= 1
             continue
 
-        thread = resource['thread']
-        if thread:
-            thread.join(5)
-            if not thread.is_alive():
-                resource['thread'] = None
+        task = resource['task']
+        if task:
+            if task.wait(5):
+                resource['task'] = None
                 resource['complete'] = True
                 remaining -= 1
         else:
-            thread = Thread(target=_fetch, args=(resource,))
-            thread.daemon = True
-            thread.start()
-            resource['thread'] = thread
+            resource['task'] = pool.submit(_fetch, resource)
 
     return result
 
@@ -828,7 +828,9 @@ class VideoInfo(YouTubeRequestClient):
             return ''
 
         js_url = self._normalize_url(js_url)
-        self._data_cache.set_item('player_js_url', {'url': js_url})
+        self._data_cache.set_item('player_js_url',
+                                  {'url': js_url},
+                                  self._data_cache.ONE_HOUR * 4)
 
         js_cache_key = quote(js_url)
         cached = self._data_cache.get_item(js_cache_key,
@@ -855,7 +857,9 @@ class VideoInfo(YouTubeRequestClient):
         if not result:
             return ''
 
-        self._data_cache.set_item(js_cache_key, {'js': result})
+        self._data_cache.set_item(js_cache_key,
+                                  {'js': result},
+                                  self._data_cache.ONE_HOUR * 4)
         return result
 
     @staticmethod
@@ -1055,7 +1059,9 @@ class VideoInfo(YouTubeRequestClient):
                     details=''.join(format_stack())
                 ))
                 return None
-            self._data_cache.set_item(encrypted_signature, {'sig': signature})
+            self._data_cache.set_item(encrypted_signature,
+                                      {'sig': signature},
+                                      self._data_cache.ONE_HOUR * 4)
 
         if signature:
             url = '{0}&{1}={2}'.format(url, query_var, signature)
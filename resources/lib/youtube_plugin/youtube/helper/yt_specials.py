@@ -141,8 +141,15 @@ def _process_disliked_videos(provider, context):
 def _process_live_events(provider, context, event_type='live'):
     context.set_content(content.VIDEO_CONTENT)
 
-    # TODO: cache result
-    json_data = provider.get_client(context).get_live_events(
+    # Results are only cached for use when the remaining quota is low
+    client = provider.get_client(context)
+    quota_ledger = client.get_quota_ledger()
+    function_cache = context.get_function_cache()
+    json_data = function_cache.run(
+        client.get_live_events,
+        quota_ledger.get_ttl('search', function_cache.ONE_MINUTE * 10),
+        _refresh=not quota_ledger.is_low('search'),
+        _max_ttl=quota_ledger.get_max_ttl(function_cache.ONE_MINUTE * 10),
         event_type=event_type,
         order='date' if event_type == 'upcoming' else 'viewCount',
         page_token=context.get_param('page_token', ''),
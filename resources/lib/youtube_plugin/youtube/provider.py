@@ -381,13 +381,27 @@ class Provider(AbstractProvider):
         page_token = context.get_param('page_token', '')
         safe_search = context.get_settings().safe_search()
 
-        # no caching
-        json_data = self.get_client(context).search(q='',
-                                                    search_type='video',
-                                                    event_type='live',
-                                                    channel_id=channel_id,
-                                                    page_token=page_token,
-                                                    safe_search=safe_search)
+        # Results are only cached for use when the remaining quota is low
+        client = self.get_client(context)
+        quota_ledger = client.get_quota_ledger()
+        function_cache = context.get_function_cache()
+        json_data = function_cache.run(client.search,
+                                       quota_ledger.get_ttl(
+                                           'search',
+                                           function_cache.ONE_MINUTE * 10,
+                                       ),
+                                       _refresh=not quota_ledger.is_low(
+                                           'search'
+                                       ),
+                                       _max_ttl=quota_ledger.get_max_ttl(
+                                           function_cache.ONE_MINUTE * 10,
+                                       ),
+                                       q='',
+                                       search_type='video',
+                                       event_type='live',
+                                       channel_id=channel_id,
+                                       page_token=page_token,
+                                       safe_search=safe_search)
         if not json_data:
             return False
         result.extend(v3.response_to_items(self, context, json_data))
@@ -442,6 +456,7 @@ class Provider(AbstractProvider):
             json_data = function_cache.run(client.get_channel_by_username,
                                            function_cache.ONE_DAY,
                                            _refresh=params.get('refresh'),
+                                           _stale_ttl=function_cache.ONE_WEEK,
                                            username=channel_id)
             if not json_data:
                 return False
@@ -811,10 +826,18 @@ class Provider(AbstractProvider):
                 )
                 result.append(live_item)
 
+        client = self.get_client(context)
+        quota_ledger = client.get_quota_ledger()
         function_cache = context.get_function_cache()
-        json_data = function_cache.run(self.get_client(context).search,
-                                       function_cache.ONE_MINUTE * 10,
+        json_data = function_cache.run(client.search,
+                                       quota_ledger.get_ttl(
+                                           'search',
+                                           function_cache.ONE_MINUTE * 10,
+                                       ),
                                        _refresh=params.get('refresh'),
+                                       _max_ttl=quota_ledger.get_max_ttl(
+                                           function_cache.ONE_MINUTE * 10,
+                                       ),
                                        q=search_text,
                                        search_type=search_type,
                                        event_type=event_type,
@@ -980,7 +1003,10 @@ class Provider(AbstractProvider):
 
         if action == 'list':
             context.set_content(content.VIDEO_CONTENT, sub_type='history')
-            items = playback_history.get_items()
+            items, next_page_token = playback_history.get_page(
+                page_token=params.get('page_token'),
+                limit=context.get_settings().items_per_page(),
+            )
             if not items:
                 return True
 
@@ -993,7 +1019,8 @@ class Provider(AbstractProvider):
                         'partial': True,
                     }
                     for video_id in items.keys()
-                ]
+                ],
+                'nextPageToken': next_page_token,
             }
             video_items = v3.response_to_items(self, context, v3_response)
 
@@ -1361,7 +1388,10 @@ class Provider(AbstractProvider):
 
         if command == 'list':
             context.set_content(content.VIDEO_CONTENT, sub_type='watch_later')
-            items = context.get_watch_later_list().get_items()
+            items, next_page_token = context.get_watch_later_list().get_page(
+                page_token=params.get('page_token'),
+                limit=context.get_settings().items_per_page(),
+            )
             if not items:
                 return True
 
@@ -1374,7 +1404,8 @@ class Provider(AbstractProvider):
                         'partial': True,
                     }
                     for video_id in items.keys()
-                ]
+                ],
+                'nextPageToken': next_page_token,
             }
             video_items = v3.response_to_items(self, context, v3_response)
 
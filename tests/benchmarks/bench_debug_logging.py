@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+
+    Cost of debug logging in hot paths when Kodi debug logging is disabled.
+
+    Usage: python tests/benchmarks/bench_debug_logging.py [calls]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+from timeit import timeit
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_kodi  # noqa: E402
+
+fake_kodi.install()
+
+import xbmc  # noqa: E402
+
+from youtube_plugin.kodion import logger  # noqa: E402
+from youtube_plugin.kodion.utils.methods import select_stream  # noqa: E402
+
+
+LOGGED = []
+xbmc.getCondVisibility = lambda condition: False
+xbmc.log = lambda msg, level=0: LOGGED.append(msg)
+
+
+class Settings(object):
+    def get_video_quality(self, quality_map_override=None):
+        return 1080
+
+    def ask_for_video_quality(self):
+        return False
+
+    def audio_only(self):
+        return False
+
+    def use_mpd_videos(self):
+        return False
+
+    def use_isa_live_streams(self):
+        return False
+
+
+class Context(object):
+    def get_settings(self):
+        return Settings()
+
+    def get_ui(self):
+        return None
+
+    def use_inputstream_adaptive(self):
+        return False
+
+    def inputstream_adaptive_capabilities(self, capability=None):
+        return False
+
+    @staticmethod
+    def log_debug(text, **kwargs):
+        logger.log_debug(text, **kwargs)
+
+
+STREAMS = [{
+    'title': '{0}p'.format(height),
+    'container': 'mp4',
+    'sort': [height, 0],
+    'url': ('https://rr1.googlevideo.com/videoplayback'
+            '?ip=1.2.3.4&itag={0}&sig={1}'.format(itag, 'a' * 500)),
+    'video': {'height': height, 'encoding': 'h264'},
+    'audio': {'bitrate': 128, 'encoding': 'aac'},
+    'meta': {'video': {'height': height}, 'audio': {}},
+} for itag, height in enumerate((144, 240, 360, 480, 720, 1080, 1440, 2160)
+                                * 4)]
+
+PARAMS = dict.fromkeys(['UC%022d' % idx for idx in range(50)], {})
+
+
+def _per_call(func, calls):
+    return timeit(func, number=calls) / calls * 1e6
+
+
+def main(calls=2000):
+    context = Context()
+    results = (
+        ('select_stream, {0} streams'.format(len(STREAMS)), _per_call(
+            lambda: select_stream(context, STREAMS),
+            calls,
+        )),
+        ('debug message, 50 id payload, formatted', _per_call(
+            lambda: logger.log_debug(
+                'API request:\nparams: |{params}|'.format(params=PARAMS)
+            ),
+            calls * 10,
+        )),
+        ('debug message, 50 id payload, lazy', _per_call(
+            lambda: logger.log_debug('API request:\nparams: |{params}|',
+                                     params=PARAMS),
+            calls * 10,
+        )),
+    )
+    print('Debug logging disabled')
+    for name, elapsed in results:
+        print('  {0:<42}{1:>10.1f} us'.format(name, elapsed))
+    print('Lines logged: {0}'.format(len(LOGGED)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
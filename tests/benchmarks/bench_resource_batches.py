@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+
+    ResourceManager.get_videos for uncached ids, with batches of 50 ids
+    requested one after another or concurrently. Responses are recorded to a
+    fixture archive from a fake API, then replayed with added latency.
+
+    Usage: python tests/benchmarks/bench_resource_batches.py [ids] [latency]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from timeit import default_timer
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_kodi  # noqa: E402
+
+fake_kodi.install()
+
+
+def _fake_send(adapter, request, **_kwargs):
+    from requests import Response
+    from requests.structures import CaseInsensitiveDict
+    from youtube_plugin.kodion.compatibility import parse_qsl, urlsplit
+
+    query = dict(parse_qsl(urlsplit(request.url).query))
+    body = {
+        'kind': 'youtube#videoListResponse',
+        'items': [{'kind': 'youtube#video',
+                   'id': video_id,
+                   'snippet': {'title': 'Video ' + video_id}}
+                  for video_id in query['id'].split(',')],
+    }
+    response = Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict({
+        'Content-Type': 'application/json; charset=UTF-8',
+    })
+    response._content = json.dumps(body).encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class Settings(object):
+    def use_local_history(self):
+        return False
+
+    def get_bool(self, setting, default=None):
+        return False
+
+
+class Context(object):
+    def __init__(self, data_cache):
+        self._data_cache = data_cache
+
+    def get_data_cache(self):
+        return self._data_cache
+
+    def get_function_cache(self):
+        return None
+
+    def get_settings(self):
+        return Settings()
+
+    def get_param(self, name, default=None):
+        return default
+
+    def __getattr__(self, name):
+        return lambda *_args, **_kwargs: None
+
+
+def _serial_batches(resource_manager, method, ids, **kwargs):
+    return [(batch, method(batch, **kwargs))
+            for batch in resource_manager._list_batch(ids, n=50)]
+
+
+def _get_videos(ids, serial=False):
+    from youtube_plugin.kodion.sql_store import DataCache
+    from youtube_plugin.youtube.client.youtube import YouTube
+    from youtube_plugin.youtube.helper.resource_manager import ResourceManager
+
+    data_cache = DataCache(os.path.join(tempfile.mkdtemp(), 'cache.sqlite'))
+    context = Context(data_cache)
+    resource_manager = ResourceManager(context, YouTube(context=context))
+    if serial:
+        resource_manager._get_batches = (
+            lambda *args, **kwargs: _serial_batches(resource_manager,
+                                                    *args,
+                                                    **kwargs)
+        )
+
+    start = default_timer()
+    result = resource_manager.get_videos(ids, suppress_errors=True)
+    elapsed = default_timer() - start
+    found = sum(1 for item in result.values() if item)
+    cached = len(data_cache.get_items(ids, data_cache.ONE_MONTH))
+    data_cache.close()
+    return elapsed, found, cached
+
+
+def _ids(num):
+    return ['vid%08d' % idx for idx in range(num)]
+
+
+def run(mode, num_ids):
+    ids = _ids(num_ids)
+    if mode == 'record':
+        from requests.adapters import HTTPAdapter
+
+        HTTPAdapter.send = _fake_send
+        _get_videos(ids)
+        return
+
+    for label, serial, _ids_ in (
+            ('serial', True, ids),
+            ('parallel', False, ids),
+            # The last batch is not in the archive and fails
+            ('parallel, one batch missing', False, ids[50:] + _ids(
+                num_ids + 50
+            )[-50:]),
+    ):
+        elapsed, found, cached = _get_videos(_ids_, serial=serial)
+        print('  {0:<30}{1:>6.2f}s  {2} items, {3} cached'.format(
+            label, elapsed, found, cached
+        ))
+
+
+def main(num_ids=500, latency=0.2):
+    archive = os.path.join(tempfile.mkdtemp(), 'fixtures.zip')
+    env = dict(os.environ)
+    for mode in ('record', 'replay'):
+        env['YOUTUBE_TRANSPORT'] = ':'.join((mode, archive))
+        if mode == 'replay':
+            env['YOUTUBE_TRANSPORT_LATENCY'] = str(latency)
+            print('get_videos for {0} uncached ids, replayed with {1}s'
+                  ' latency'.format(num_ids, latency))
+        # The transport adapter is selected when the module is imported
+        subprocess.check_call([sys.executable,
+                               os.path.abspath(__file__),
+                               mode,
+                               str(num_ids)],
+                              env=env)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] in (['record'], ['replay']):
+        run(sys.argv[1], int(sys.argv[2]))
+    else:
+        main(*[float(arg) if idx else int(arg)
+               for idx, arg in enumerate(sys.argv[1:])])
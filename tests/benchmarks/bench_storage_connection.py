@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+
+    Per call latency of Storage reads and writes, using the connection that
+    is kept open for the whole invocation.
+
+    Usage: python tests/benchmarks/bench_storage_connection.py [calls]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sys
+import tempfile
+from timeit import default_timer
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_kodi  # noqa: E402
+
+fake_kodi.install()
+
+from youtube_plugin.kodion.sql_store import DataCache  # noqa: E402
+
+
+ROWS = 500
+ITEM = {'id': 'x', 'snippet': {'title': 't' * 200}}
+
+
+def _per_call(func, calls):
+    start = default_timer()
+    for idx in range(calls):
+        func(idx)
+    return (default_timer() - start) / calls * 1e6
+
+
+def main(calls=500):
+    cache = DataCache(os.path.join(tempfile.mkdtemp(), 'data_cache.sqlite'),
+                      max_file_size_mb=20)
+    cache.set_items({'k%d' % idx: ITEM for idx in range(ROWS)})
+    keys = ['k%d' % idx for idx in range(50)]
+
+    results = (
+        ('get_item', _per_call(
+            lambda idx: cache.get_item('k%d' % (idx % ROWS), cache.ONE_DAY),
+            calls,
+        )),
+        ('set_item', _per_call(
+            lambda idx: cache.set_item('s%d' % idx, ITEM),
+            calls,
+        )),
+        ('get_items(50)', _per_call(
+            lambda idx: cache.get_items(keys, cache.ONE_DAY),
+            calls // 10,
+        )),
+    )
+    print('DataCache with {0} rows, {1} calls'.format(ROWS, calls))
+    for name, elapsed in results:
+        print('  {0:<16}{1:>10.1f} us'.format(name, elapsed))
+    cache.close()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+
+    Lookups and removals of many Storage keys, which are bound in chunks.
+
+    Usage: python tests/benchmarks/bench_storage_many_keys.py [repeats]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import sqlite3
+import sys
+import tempfile
+from timeit import default_timer
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_kodi  # noqa: E402
+
+fake_kodi.install()
+
+from youtube_plugin.kodion.sql_store import PlaybackHistory  # noqa: E402
+
+
+ROWS = 20000
+SIZES = (50, 500, 5000)
+
+
+def _keys(num):
+    # Half of the keys are present
+    return ['v%05d' % (ROWS - num // 2 + idx) for idx in range(num)]
+
+
+def _ms(func, repeats):
+    start = default_timer()
+    for idx in range(repeats):
+        func(idx)
+    return (default_timer() - start) / repeats * 1e3
+
+
+def main(repeats=20):
+    path = os.path.join(tempfile.mkdtemp(), 'history.sqlite')
+    history = PlaybackHistory(path)
+    history._set_many({'v%05d' % idx: {'play_count': idx}
+                       for idx in range(ROWS)})
+
+    print('PlaybackHistory with {0} rows, {1} repeats'.format(ROWS, repeats))
+    print('  {0:<24}'.format('') + ''.join('{0:>8} ids'.format(size)
+                                          for size in SIZES))
+    rows = [('get_items, same length', []),
+            ('get_items, varied', []),
+            ('_remove_many', [])]
+    for size in SIZES:
+        keys = _keys(size)
+        rows[0][1].append(_ms(
+            lambda idx: history.get_items(keys),
+            repeats,
+        ))
+        rows[1][1].append(_ms(
+            lambda idx: history.get_items(keys[:size - idx]),
+            repeats,
+        ))
+
+        removed = {key: {'play_count': 0} for key in keys[:size // 2]}
+        elapsed = 0
+        for _ in range(repeats):
+            start = default_timer()
+            history._remove_many(keys)
+            elapsed += default_timer() - start
+            history._set_many(removed)
+        rows[2][1].append(elapsed / repeats * 1e3)
+    for name, times in rows:
+        print('  {0:<24}'.format(name)
+              + ''.join('{0:>9.2f} ms'.format(elapsed) for elapsed in times))
+
+    # SQLite builds can be limited to 999 variables per statement
+    with history as (db, cursor):
+        if not hasattr(db, 'setlimit'):
+            return
+        db.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    keys = _keys(1502)
+    print('With a limit of 999 variables, get_items({0} ids) returned {1}'
+          ' items'.format(len(keys), len(history.get_items(keys))))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import sys
+import tempfile
+import time
+import types
+
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__
+))), 'resources', 'lib')
+
+
+class _Anything(object):
+    """
+    Stand-in for any Kodi object or function not used by the tests
+    """
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    def __call__(self, *_args, **_kwargs):
+        return _Anything()
+
+    def __getattr__(self, name):
+        return _Anything()
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(())
+
+    def __str__(self):
+        return ''
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    module.__getattr__ = lambda _name: _Anything()
+    sys.modules[name] = module
+    return module
+
+
+class Monitor(object):
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        time.sleep(timeout or 0)
+        return False
+
+
+class Addon(object):
+    def __init__(self, id=None):
+        self._profile = os.environ['KODI_PROFILE']
+
+    def getAddonInfo(self, name):
+        return {
+            'id': 'plugin.video.youtube',
+            'name': 'YouTube',
+            'path': LIB_PATH,
+            'profile': self._profile,
+        }.get(name, '')
+
+    # Settings are not available, so default values are used
+    def _no_setting(self, *_args):
+        raise RuntimeError('Setting not available')
+
+    getSetting = getSettingBool = getSettingInt = getSettingString = (
+        _no_setting
+    )
+    setSetting = setSettingBool = setSettingInt = setSettingString = (
+        _no_setting
+    )
+
+    def getLocalizedString(self, string_id):
+        return ''
+
+    def __getattr__(self, name):
+        return _Anything()
+
+
+class Window(object):
+    _properties = {}
+
+    def __init__(self, window_id=0):
+        pass
+
+    def getProperty(self, name):
+        return self._properties.get(name, '')
+
+    def setProperty(self, name, value):
+        self._properties[name] = value
+
+    def clearProperty(self, name):
+        self._properties.pop(name, None)
+
+
+def _translate_path(path):
+    if path.startswith('special://'):
+        return os.path.join(os.environ['KODI_PROFILE'],
+                            *path[len('special://'):].split('/'))
+    return path
+
+
+def _mkdirs(path):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return True
+
+
+def install():
+    """
+    Adds the add-on library path to sys.path, and fake Kodi modules to
+    sys.modules, so that add-on modules can be imported outside of Kodi
+    """
+    if LIB_PATH not in sys.path:
+        sys.path.insert(0, LIB_PATH)
+    if 'xbmc' in sys.modules:
+        return
+    os.environ.setdefault('KODI_PROFILE', tempfile.mkdtemp())
+
+    _module('xbmc',
+            LOGDEBUG=0,
+            LOGINFO=1,
+            LOGWARNING=2,
+            LOGERROR=3,
+            LOGFATAL=4,
+            LOGNONE=5,
+            Monitor=Monitor,
+            log=lambda msg, level=0: None,
+            getCondVisibility=lambda condition: False,
+            getInfoLabel=lambda label: '20.0',
+            executebuiltin=lambda *_args: None,
+            translatePath=_translate_path)
+    _module('xbmcaddon', Addon=Addon)
+    _module('xbmcgui', Window=Window)
+    _module('xbmcplugin')
+    _module('xbmcvfs',
+            exists=os.path.exists,
+            mkdirs=_mkdirs,
+            translatePath=_translate_path)
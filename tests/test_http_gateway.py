@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+from io import BytesIO
+
+import pytest
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from youtube_plugin.kodion.network import http_server
+
+
+class FakeUpstream(object):
+    def __init__(self, *responses):
+        self.calls = []
+        self._responses = list(responses)
+
+    def request(self, url, **kwargs):
+        self.calls.append(dict(kwargs, url=url))
+        status_code, headers = self._responses.pop(0)
+        response = Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = b'content'
+        response.url = url
+        return response
+
+
+class FakeHandler(http_server.RequestHandler):
+    # Not connected to a socket, so the handler is not set up by __init__
+    def __init__(self, request, client_ip='127.0.0.1'):
+        body = json.dumps(request).encode('utf-8')
+        self.headers = {'Content-Length': str(len(body))}
+        self.rfile = BytesIO(body)
+        self.wfile = BytesIO()
+        self.client_address = (client_ip, 12345)
+        self.status = None
+        self.response_headers = {}
+
+    def send_error(self, code, message=None, explain=None):
+        self.status = code
+
+    def send_response(self, code, message=None):
+        self.status = code
+
+    def send_header(self, keyword, value):
+        self.response_headers[keyword] = value
+
+    def end_headers(self):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def _upstream(*responses):
+        fake_upstream = FakeUpstream(*responses)
+        monkeypatch.setattr(http_server, '_server_requests', fake_upstream)
+        monkeypatch.setattr(http_server,
+                            '_gateway_cache',
+                            http_server.GatewayCache())
+        return fake_upstream
+
+    return _upstream
+
+
+def _gateway_request(request, **kwargs):
+    handler = FakeHandler(request, **kwargs)
+    handler.gateway_request()
+    return handler
+
+
+def test_gateway_is_only_available_from_loopback(upstream):
+    fake_upstream = upstream((200, {}))
+    request = {'method': 'GET', 'url': 'https://www.youtube.com/'}
+
+    assert _gateway_request(request, client_ip='192.168.1.2').status == 403
+    assert _gateway_request(request, client_ip='::1').status == 200
+    assert len(fake_upstream.calls) == 1
+
+
+def test_gateway_only_forwards_request_arguments(upstream):
+    fake_upstream = upstream((200, {}))
+    handler = _gateway_request({
+        'method': 'GET',
+        'url': 'https://www.googleapis.com/youtube/v3/videos',
+        'params': {'id': 'a'},
+        'timeout': [9.5, 27],
+        'verify': False,
+        'proxies': {'https': 'http://example.com'},
+    })
+
+    assert handler.status == 200
+    call = fake_upstream.calls[0]
+    assert call['params'] == {'id': 'a'}
+    assert call['timeout'] == (9.5, 27)
+    assert call['allow_redirects'] is False
+    assert 'verify' not in call
+    assert 'proxies' not in call
+
+
+def test_gateway_redirects_are_checked(upstream):
+    fake_upstream = upstream(
+        (302, {'Location': 'https://m.youtube.com/watch'}),
+        (302, {'Location': 'https://example.com/'}),
+    )
+    handler = _gateway_request({'method': 'GET',
+                                'url': 'https://www.youtube.com/watch'})
+
+    assert handler.status == 502
+    assert handler.response_headers.get('X-Gateway-Error') == 'true'
+    assert [call['url'] for call in fake_upstream.calls] == [
+        'https://www.youtube.com/watch',
+        'https://m.youtube.com/watch',
+    ]
+
+
+def test_gateway_redirects_are_returned_if_not_allowed(upstream):
+    fake_upstream = upstream((302, {'Location': 'https://example.com/'}))
+    handler = _gateway_request({'method': 'GET',
+                                'url': 'https://www.youtube.com/watch',
+                                'allow_redirects': False})
+
+    assert handler.status == 302
+    assert len(fake_upstream.calls) == 1
+
+
+def test_gateway_cache_ignores_timeout(upstream):
+    fake_upstream = upstream((200, {}), (200, {}))
+    url = 'https://www.googleapis.com/youtube/v3/channels'
+
+    first = _gateway_request({'method': 'GET', 'url': url, 'timeout': 5})
+    second = _gateway_request({'method': 'GET', 'url': url, 'timeout': 10})
+
+    assert first.response_headers['X-Gateway-Cache'] == 'miss'
+    assert second.response_headers['X-Gateway-Cache'] == 'hit'
+    assert len(fake_upstream.calls) == 1
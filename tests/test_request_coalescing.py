@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+from threading import Event, Lock, Thread
+
+import pytest
+
+from youtube_plugin.kodion.network import BaseRequestsClass
+
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+TIMEOUT = 5
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeHandler)
+        self.hits = []
+        self.hits_lock = Lock()
+        # Responses are held back until released, so that requests overlap
+        self.release = Event()
+        self.release.set()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.hits_lock:
+            server.hits.append(self.path)
+        server.release.wait(TIMEOUT)
+
+        status = 404 if self.path.startswith('/missing') else 200
+        body = json.dumps({'path': self.path, 'items': [1, 2, 3]})
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def server():
+    fake_server = FakeServer()
+    thread = Thread(target=fake_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield fake_server
+    fake_server.release.set()
+    fake_server.shutdown()
+    fake_server.server_close()
+
+
+def _json_hook(response):
+    response.raise_for_status()
+    return response.json()
+
+
+def _concurrent_requests(server, num_requests, **kwargs):
+    client = BaseRequestsClass(gateway=False)
+    results = [None] * num_requests
+    errors = [None] * num_requests
+
+    def _request(idx, url):
+        try:
+            results[idx] = client.request(url,
+                                          timeout=TIMEOUT,
+                                          retry=False,
+                                          response_hook=_json_hook,
+                                          **kwargs)
+        except Exception as exc:
+            errors[idx] = exc
+
+    server.release.clear()
+    url = kwargs.pop('url', server.url + '/videos')
+    threads = [Thread(target=_request, args=(idx, url))
+               for idx in range(num_requests)]
+    for thread in threads:
+        thread.start()
+    # Wait for the first request to reach the server before releasing it, so
+    # that the other requests are made while the first is still in flight
+    for _ in range(100):
+        if server.hits:
+            break
+        Event().wait(0.01)
+    Event().wait(0.1)
+    server.release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    return results, errors
+
+
+def test_coalesced_requests_are_made_once(server):
+    results, errors = _concurrent_requests(server, 5, coalesce=True)
+
+    assert errors == [None] * 5
+    assert len(server.hits) == 1
+    assert all(result == {'path': '/videos', 'items': [1, 2, 3]}
+               for result in results)
+    assert not BaseRequestsClass._flights
+
+
+def test_coalesced_results_are_copies(server):
+    results, _ = _concurrent_requests(server, 3, coalesce=True)
+
+    results[0]['items'].append(4)
+    assert results[1]['items'] == [1, 2, 3]
+    assert results[2]['items'] == [1, 2, 3]
+    assert len({id(result) for result in results}) == 3
+
+
+def test_requests_are_not_coalesced_by_default(server):
+    results, errors = _concurrent_requests(server, 3)
+
+    assert errors == [None] * 3
+    assert len(server.hits) == 3
+
+
+def test_different_params_are_not_coalesced(server):
+    client = BaseRequestsClass(gateway=False)
+    threads = [
+        Thread(target=client.request,
+               args=(server.url + '/videos',),
+               kwargs={'params': {'id': video_id},
+                       'timeout': TIMEOUT,
+                       'retry': False,
+                       'coalesce': True})
+        for video_id in ('a', 'b', 'a')
+    ]
+    server.release.clear()
+    for thread in threads:
+        thread.start()
+    Event().wait(0.2)
+    server.release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert sorted(server.hits) == ['/videos?id=a', '/videos?id=b']
+
+
+def test_coalesced_errors_are_raised_for_all_callers(server):
+    results, errors = _concurrent_requests(server,
+                                           3,
+                                           url=server.url + '/missing',
+                                           coalesce=True,
+                                           raise_exc=True)
+
+    assert len(server.hits) == 1
+    assert results == [None] * 3
+    assert all(isinstance(error, Exception) for error in errors)
+    assert not BaseRequestsClass._flights
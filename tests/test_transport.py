@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+
+    Copyright (C) 2024-present plugin.video.youtube
+
+    SPDX-License-Identifier: GPL-2.0-only
+    See LICENSES/GPL-2.0-only for more information.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import zipfile
+
+import pytest
+from requests import Request, Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from youtube_plugin.kodion.network.transport import RecordReplayAdapter
+
+
+PLAYER_JS = (
+    'var a={b:function(c){c.reverse()}};'
+    'function d(e){e=e.split("");a.b(e,3);return e.join("")};'
+    'var f=g&&h==1?"i=j&k=l":null;'
+).encode('utf-8')
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return str(tmp_path / 'fixtures.zip')
+
+
+def _upstream(monkeypatch, content, content_type):
+    def _send(adapter, request, **_kwargs):
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict({'Content-Type': content_type})
+        response._content = content
+        response.url = request.url
+        response.request = request
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, 'send', _send)
+
+
+def _request(url, method='GET', **kwargs):
+    return Request(method, url, **kwargs).prepare()
+
+
+def _record_and_replay(monkeypatch, archive, request, content, content_type):
+    _upstream(monkeypatch, content, content_type)
+    recorded = RecordReplayAdapter(RecordReplayAdapter.RECORD, archive)
+    recorded.send(request)
+    monkeypatch.undo()
+
+    replayed = RecordReplayAdapter(RecordReplayAdapter.REPLAY, archive)
+    try:
+        return replayed.send(request).content
+    finally:
+        replayed.close()
+
+
+@pytest.mark.parametrize('content, content_type', (
+    (PLAYER_JS, 'text/javascript; charset=utf-8'),
+    (PLAYER_JS, None),
+    ('<html><a href="?a=1&b=2">é</a></html>'.encode('utf-8'), 'text/html'),
+    (b'\x00\xff=\xfe', 'application/octet-stream'),
+))
+def test_text_and_binary_responses_replay_unchanged(monkeypatch,
+                                                    archive,
+                                                    content,
+                                                    content_type):
+    request = _request('https://www.youtube.com/s/player/base.js')
+    assert _record_and_replay(monkeypatch,
+                              archive,
+                              request,
+                              content,
+                              content_type or '') == content
+
+
+def test_json_response_secrets_are_redacted(monkeypatch, archive):
+    content = json.dumps({
+        'access_token': 'hunter2',
+        'expires_in': 3600,
+        'code': 200,
+    }).encode('utf-8')
+    request = _request('https://oauth2.googleapis.com/token',
+                       method='POST',
+                       data={'client_secret': 'hunter2', 'grant_type': 'a=b'})
+    replayed = _record_and_replay(monkeypatch,
+                                  archive,
+                                  request,
+                                  content,
+                                  'application/json; charset=utf-8')
+
+    assert json.loads(replayed.decode('utf-8')) == {
+        'access_token': RecordReplayAdapter.REDACTED,
+        'expires_in': 3600,
+        'code': 200,
+    }
+    with zipfile.ZipFile(archive) as fixtures:
+        for name in fixtures.namelist():
+            assert b'hunter2' not in fixtures.read(name)